@@ -1,35 +1,108 @@
 # main.py (AIFlowCraft - Split Node LangGraph Flow with Live Logs)
 
+import logging
+import os
+import pandas as pd
 import streamlit as st
 import time
 import graphviz
 import streamlit.components.v1 as components
-from orchestrator.orchestrator import run_generation, run_review, advance_node
+from orchestrator.orchestrator import get_engine, start_workflow, advance_node
+from orchestrator.engine import STAGES, TRANSITIONS
+from utils.review_utils import DEFAULT_FUSED_REVIEW_THRESHOLD
+from utils.llm_pool import LLMClientPool, set_default_pool, DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT
+from utils.llm_cache import LLMResponseCache, set_default_cache, get_cache, DEFAULT_CACHE_PATH
+from utils.retrieval import DEFAULT_TOP_K, DEFAULT_TOKEN_BUDGET
+from utils.db_sampling import DEFAULT_REFERENCE_CHARS, DEFAULT_ROWS_PER_TABLE
+from utils.db_reference import REFERENCE_MODES, DEFAULT_REFERENCE_MODE, build_search_index, connection_pool, db_fingerprint
+from utils.reference_backends import FILE_TYPES
+from utils.upload_store import UploadStore, DEFAULT_UPLOAD_DIR
+from utils.github_queue import GitHubUploadQueue, set_default_queue, DEFAULT_QUEUE_PATH
+from utils.log_store import LEVELS
+from utils.tracing import InMemorySink, add_sink, sinks_from_env
+
+
+# Diagnostics (e.g. database reference lookups) are logged at DEBUG level
+logging.basicConfig(level=os.getenv("AIFLOWCRAFT_LOG_LEVEL", "WARNING"))
+
+
+# === Shared LLM client pool (one per process, reused across sessions and reruns) ===
+@st.cache_resource
+def llm_client_pool(pool_size, idle_timeout):
+    return LLMClientPool(pool_size=pool_size, idle_timeout=idle_timeout)
+
+
+set_default_pool(llm_client_pool(DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT))
+
+
+# === Shared LLM response cache (memory LRU + SQLite file) ===
+@st.cache_resource
+def llm_response_cache(path):
+    return LLMResponseCache(path=path)
+
+
+set_default_cache(llm_response_cache(DEFAULT_CACHE_PATH))
+
+
+# === Background GitHub upload queue (one worker thread per process) ===
+@st.cache_resource
+def github_upload_queue(path):
+    return GitHubUploadQueue(path=path)
+
+
+upload_queue = github_upload_queue(DEFAULT_QUEUE_PATH)
+set_default_queue(upload_queue)
+
+
+# === Tracing spans (kept in memory for the timings view; file sinks from the environment) ===
+@st.cache_resource
+def trace_sink():
+    sink = InMemorySink()
+    for extra in [sink] + sinks_from_env():
+        add_sink(extra)
+    return sink
+
+
+spans_sink = trace_sink()
+
+# === Content-addressed store for uploaded databases (shared by all sessions) ===
+@st.cache_resource
+def upload_store(root):
+    # Open connections to a stored file are closed before the file is deleted
+    store = UploadStore(root, on_delete=connection_pool.discard)
+    # Files left behind by an earlier server process
+    store.prune()
+    return store
+
+
+# === Reference data preview, cached by content hash (a stored upload never changes) ===
+PREVIEW_PAGE_SIZE = 20
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def preview_tables(content_hash, db_type, _path):
+    with connection_pool.connection(db_fingerprint(_path), db_type) as backend:
+        return [(table, *backend.row_count(table)) for table in backend.tables()]
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def preview_page(content_hash, db_type, table, after, _path):
+    with connection_pool.connection(db_fingerprint(_path), db_type) as backend:
+        columns, rows, next_key = backend.page(table, after, PREVIEW_PAGE_SIZE)
+    return pd.DataFrame(rows, columns=columns), next_key
+
+
+@st.cache_data(max_entries=32, show_spinner="🔎 Indexing text columns for relevance search...")
+def search_index(content_hash, db_type, _path):
+    return build_search_index({"db_type": db_type, "db_path": _path})
+
+
 # === Init session state ===
-def init():
-    if "workflow_started" not in st.session_state:
-        st.session_state.workflow_started = False
-    if "current_node" not in st.session_state:
-        st.session_state.output = {}
-        st.session_state.approved = {}
-        st.session_state.feedback = {}
-        st.session_state.review_mode = {
-            "userstories": "AI",
-            "design": "AI",
-            "code": "AI",
-            "review": "AI",
-            "qa": "AI"
-        }
-        st.session_state.current_node = "userstories_gen"
-        st.session_state.logs = []
-        st.session_state.paused_stage = None
-        st.session_state.config = {"groq_api_key": None, "db_type": "none", "db_path": ""}
-
-init()
+engine = get_engine()
 
 # === Sidebar ===
 st.sidebar.title("🔧 Configuration")
-st.session_state.config['groq_api_key'] = st.sidebar.text_input("Groq API Key", type="password", help="Used to access Groq LLMs. Required to generate outputs.")
+engine.config['groq_api_key'] = st.sidebar.text_input("Groq API Key", type="password", help="Used to access Groq LLMs. Required to generate outputs.")
 
 # === Review Mode Configuration ===
 with st.sidebar.expander("🧠 Review Mode Settings", expanded=True):
@@ -41,62 +114,213 @@ with st.sidebar.expander("🧠 Review Mode Settings", expanded=True):
     "qa": "QA"
     }
 
-    for stage in ["userstories", "design", "code", "review", "qa"]:
-        st.session_state.review_mode[stage] = st.radio(
+    for stage in STAGES:
+        engine.review_mode[stage] = st.radio(
             f"{stage_labels[stage]} Review",
             ["AI", "User"],
             index=0,
             key=f"mode_{stage}",
             help=f"Choose whether the {stage_labels[stage]} stage should be reviewed by AI or manually by you."
         )
+
+    fused_stages = st.multiselect(
+        "🧩 Fused Review Stages",
+        STAGES,
+        format_func=stage_labels.get,
+        key="fused_review_stages",
+        help="For these AI-reviewed stages, use the Decision/Reason the generator already writes at the end of its output instead of a separate review call."
+    )
+    engine.config["fused_review"] = {stage: stage in fused_stages for stage in STAGES}
+    engine.config["fused_review_threshold"] = st.slider(
+        "Fused Review Confidence Threshold",
+        min_value=0.0,
+        max_value=1.0,
+        value=DEFAULT_FUSED_REVIEW_THRESHOLD,
+        step=0.05,
+        key="fused_review_threshold",
+        help="If the generator's Decision/Reason trailer is less clear than this, the separate AI reviewer is used instead."
+    )
+
+    execution_labels = {"sequential": "Sequential", "dag": "Parallel (dependency-aware)"}
+    engine.config["execution"] = st.radio(
+        "Execution Mode",
+        list(execution_labels),
+        format_func=execution_labels.get,
+        key="execution_mode",
+        help="Parallel mode starts every stage as soon as the stages it takes as input are approved (e.g. User Stories and Design together) and always runs AI stages in one pass. Applied when the workflow is started."
+    )
+
+    engine.config["run_to_pause"] = st.checkbox(
+        "⚡ Run AI stages in one pass",
+        value=engine.config.get("run_to_pause", False),
+        key="run_to_pause",
+        help="Execute consecutive AI-reviewed stages without refreshing the page in between. The UI refreshes once when a user review is needed or the workflow ends."
+    )
     
 
 
 with st.sidebar.expander("🗄️ Advanced Settings: Database", expanded=False):
-    uploaded_db = st.file_uploader("Upload SQLite DB file", type=["db", "sqlite"], key="sqlite_upload", help="Upload a SQLite database file to use for reference data. If not provided, the flow will not use any reference data.")
+    uploaded_db = st.file_uploader("Upload reference data (SQLite, DuckDB, CSV or Parquet)", type=[ext.lstrip(".") for ext in FILE_TYPES], key="sqlite_upload", help="Upload a database or data file to use for reference data. If not provided, the flow will not use any reference data.")
 
     if uploaded_db:
-        # Save file to a temporary location
-        import tempfile
-        import os
-        import pandas as pd
-
-        temp_dir = tempfile.gettempdir()
-        temp_path = os.path.join(temp_dir, uploaded_db.name)
-
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_db.read())
-
-        st.session_state.config["db_type"] = "sqlite"
-        st.session_state.config["db_path"] = temp_path
+        # Store the file once under its content hash; reruns reuse the stored copy
+        store = upload_store(DEFAULT_UPLOAD_DIR)
+        db_upload = st.session_state.get("db_upload")
+        if db_upload is None or db_upload["file_id"] != uploaded_db.file_id:
+            suffix = os.path.splitext(uploaded_db.name)[1]
+            with st.spinner("📥 Storing database..."):
+                # The lease is released with the session state if the session expires
+                lease = store.lease(uploaded_db, suffix)
+            if db_upload is not None:
+                db_upload["lease"].release()
+            db_upload = {"file_id": uploaded_db.file_id, "digest": lease.digest, "suffix": suffix, "lease": lease}
+            st.session_state.db_upload = db_upload
+        temp_path = db_upload["lease"].path
+
+        engine.config["db_type"] = FILE_TYPES[db_upload["suffix"].lower()]
+        engine.config["db_path"] = temp_path
 
         st.success(f"📁 DB Loaded: {uploaded_db.name}")
 
-        # ✅ Optional Preview of tables
-        import sqlite3
+        # FTS5 side index (<db>.fts) so agents get the rows relevant to their stage
         try:
-            conn = sqlite3.connect(temp_path)
-            cursor = conn.cursor()
-            tables = cursor.execute("SELECT name FROM sqlite_master WHERE type='table';").fetchall()
-            table_names = [t[0] for t in tables]
+            search_index(db_upload["digest"], engine.config["db_type"], temp_path)
+        except Exception as e:
+            st.warning(f"⚠️ Search index not available: {e}")
 
-            if table_names:
+        # ✅ Optional Preview of tables (a table is only read once it is picked)
+        try:
+            tables = preview_tables(db_upload["digest"], engine.config["db_type"], temp_path)
+            if tables:
                 st.markdown("### 🧾 Tables in DB:")
-                for table in table_names:
-                    st.write(f"- `{table}`")
-
-                preview_table = st.selectbox("🔍 Preview Table", table_names)
-                df_preview = pd.read_sql_query(f"SELECT * FROM {preview_table} LIMIT 5", conn)
-                st.dataframe(df_preview)
+                for table, rows, exact in tables:
+                    st.write(f"- `{table}` ({'' if exact else '~'}{rows:,} rows)")
+
+                preview_table = st.selectbox(
+                    "🔍 Preview Table", [table for table, _, _ in tables], index=None, placeholder="Choose a table"
+                )
+                if preview_table:
+                    # Keys of the pages visited so far; the last one is shown
+                    pages = st.session_state.setdefault("preview_pages", {})
+                    keys = pages.setdefault((db_upload["digest"], preview_table), [None])
+                    df_preview, next_key = preview_page(
+                        db_upload["digest"], engine.config["db_type"], preview_table, keys[-1], temp_path
+                    )
+                    st.dataframe(df_preview)
+                    prev_col, next_col = st.columns(2)
+                    if prev_col.button("⬅️ Previous", disabled=len(keys) == 1, key="preview_prev"):
+                        keys.pop()
+                        st.rerun()
+                    if next_col.button("Next ➡️", disabled=next_key is None, key="preview_next"):
+                        keys.append(next_key)
+                        st.rerun()
+                    st.caption(f"Page {len(keys)}")
             else:
                 st.warning("No tables found in the database.")
         except Exception as e:
             st.error(f"⚠️ Failed to load DB tables: {e}")
-        finally:
-            conn.close()
 
-    
+    elif st.session_state.get("db_upload"):
+        # The upload was removed: drop this session's reference to the stored file
+        st.session_state.pop("db_upload")["lease"].release()
+        engine.config["db_type"] = "none"
+        engine.config["db_path"] = ""
+
+    engine.config["reference_mode"] = st.radio(
+        "Reference data sent to the agents",
+        REFERENCE_MODES,
+        index=REFERENCE_MODES.index(DEFAULT_REFERENCE_MODE),
+        key="reference_mode",
+        horizontal=True,
+        help="rows: schema and sample rows; profile: per-column statistics (nulls, distinct values, ranges, top values, quantiles); both: profile first, then rows."
+    )
+    engine.config["reference_search"] = st.checkbox(
+        "Add rows relevant to each stage",
+        value=True,
+        key="reference_search",
+        help="Rows matching the brief and the stage are found through a full-text index of the database's text columns."
+    )
+    engine.config["reference_char_budget"] = st.number_input(
+        "Reference data budget (characters)",
+        min_value=500,
+        value=DEFAULT_REFERENCE_CHARS,
+        step=500,
+        key="reference_char_budget",
+        help="Schema, row counts and sample rows of every table are fitted into this many characters."
+    )
+    engine.config["reference_rows_per_table"] = st.number_input(
+        "Sample rows per table",
+        min_value=0,
+        value=DEFAULT_ROWS_PER_TABLE,
+        key="reference_rows_per_table",
+        help="0 describes only the schema and row count of each table."
+    )
+
+
+
+# === Document Settings ===
+with st.sidebar.expander("📄 Document Settings", expanded=False):
+    engine.config["document_page_limit"] = st.number_input(
+        "Max PDF pages to read (0 = all)",
+        min_value=0,
+        value=0,
+        step=10,
+        key="document_page_limit",
+        help="Only the first pages of large specifications are extracted."
+    )
+    engine.config["document_char_limit"] = st.number_input(
+        "Max document characters (0 = no limit)",
+        min_value=0,
+        value=0,
+        step=10000,
+        key="document_char_limit",
+        help="Extraction stops once this many characters have been read."
+    )
+    engine.config["retrieval"] = {
+        "enabled": st.checkbox(
+            "Send only relevant sections of long documents",
+            value=True,
+            key="retrieval_enabled",
+            help="Long documents are split into chunks and each stage receives only the chunks most relevant to the brief and the stage."
+        ),
+        "top_k": st.number_input("Chunks per stage", min_value=1, value=DEFAULT_TOP_K, key="retrieval_top_k"),
+        "token_budget": st.number_input("Document token budget per stage", min_value=200, value=DEFAULT_TOKEN_BUDGET, step=100, key="retrieval_token_budget"),
+    }
+
 
+# === Token Budget ===
+with st.sidebar.expander("🔢 Token Budget", expanded=False):
+    engine.config["max_prompt_tokens"] = st.number_input(
+        "Max prompt tokens per LLM call (0 = model limit)",
+        min_value=0,
+        value=0,
+        step=500,
+        key="max_prompt_tokens",
+        help="Prompts larger than this are fitted by trimming the lowest-priority inputs first (reference data, then document content, ...). Useful to stay under per-minute token limits."
+    )
+
+
+# === LLM Response Cache ===
+with st.sidebar.expander("🗃️ LLM Response Cache", expanded=False):
+    engine.config["llm_cache_enabled"] = st.checkbox(
+        "Reuse cached LLM responses",
+        value=True,
+        key="llm_cache_enabled",
+        help="Identical prompts (same model, prompt, inputs and temperature) are answered from the cache instead of calling the LLM again."
+    )
+    bypass_stages = st.multiselect(
+        "Bypass cache for stages",
+        STAGES,
+        key="cache_bypass_stages",
+        help="Always call the LLM for these stages, e.g. to get a fresh variation."
+    )
+    engine.config["cache_bypass"] = {stage: stage in bypass_stages for stage in STAGES}
+
+    cache_stats = get_cache().stats()
+    st.caption(f"Process-wide: {cache_stats['hits']} hits / {cache_stats['misses']} misses · {cache_stats['memory_entries']} entries in memory")
+    if st.button("🧹 Clear LLM cache", key="clear_llm_cache"):
+        get_cache().clear()
+        st.success("LLM response cache cleared.")
 
 
 # === GitHub Upload Configuration ===
@@ -106,11 +330,20 @@ with st.sidebar.expander("🌐 GitHub Upload (Optional)", expanded=False):
     repo_name = st.text_input("GitHub Repo Slug", help="Format: username/repo (e.g., VishwanathBalasubramanian/aiflowcraft-generated)")
     target_path = st.text_input("Path to save file", help="Path to save the generated code (e.g., code/final_script.py)", value="code/generated_script.py")
 
-    st.session_state.config["github"] = {
+    github_branch = st.text_input("Branch", value="main", help="Branch to commit to; created from the default branch if it does not exist.")
+    include_artifacts = st.checkbox("Also upload user stories, design, review, QA report and logs", value=True)
+    artifacts_dir = st.text_input("Folder for the other artifacts", value="aiflowcraft")
+    github_api_url = st.text_input("GitHub API URL", value="https://api.github.com", help="Change only for GitHub Enterprise or a test server.")
+
+    engine.config["github"] = {
         "enabled": enable_github,
         "token": github_token,
         "repo": repo_name,
-        "path": target_path
+        "path": target_path,
+        "branch": github_branch,
+        "include_artifacts": include_artifacts,
+        "artifacts_dir": artifacts_dir,
+        "api_url": github_api_url
     }
 
 
@@ -135,15 +368,17 @@ user_file = st.file_uploader("Upload a Word/PDF file", type=["pdf", "docx"], key
 col1, col2 = st.columns(2)
 with col1:
     if st.button("🚀 Start Workflow", key="start_workflow"):
-        if st.session_state.config['groq_api_key'] and user_input:
-            st.session_state.workflow_started = True
-            st.session_state.current_node = "userstories_gen"
-            st.session_state.paused_stage = None
+        if engine.config['groq_api_key'] and user_input:
+            start_workflow(engine.config.get("execution", "sequential"))
             st.rerun()
         else:
             st.warning("⚠️ Please provide both Groq API key and user input before starting.")
 with col2:
     if st.button("🔁 Reset Workflow", key="reset_workflow"):
+        # Spilled log records and the stored upload are not needed once the run is gone
+        engine.logs.clear()
+        if st.session_state.get("db_upload"):
+            st.session_state.db_upload["lease"].release()
         for key in list(st.session_state.keys()):
             del st.session_state[key]
         st.rerun()
@@ -152,76 +387,120 @@ with col2:
 with st.expander("📌 Workflow Diagram"):
     dot = graphviz.Digraph()
     dot.attr(rankdir='HR')
-    stages = ["userstories", "design", "code", "review", "qa"]
     dot.node("Start")
     dot.edge("Start", "userstories_gen")
     dot.node("END")
-    for stage in stages:
+    for stage in STAGES:
         dot.node(f"{stage}_gen", f"{stage.title()} Gen")
         dot.node(f"{stage}_review", f"{stage.title()} Review")
         dot.edge(f"{stage}_gen", f"{stage}_review", label="Generated")
-        if stage in ["review", "qa"]:
-            dot.edge(f"{stage}_review", "code_gen", label="✖ Rejected")
-        else:
-            dot.edge(f"{stage}_review", f"{stage}_gen", label="✖ Rejected")
-    dot.edge("userstories_review", "design_gen", label="✔ Approved")
-    dot.edge("design_review", "code_gen", label="✔ Approved")
-    dot.edge("code_review", "review_gen", label="✔ Approved")
-    dot.edge("review_review", "qa_gen", label="✔ Approved")
-    dot.edge("qa_review", "END", label="✔ Approved")
+        dot.edge(f"{stage}_review", TRANSITIONS[stage][1], label="✖ Rejected")
+    for stage in STAGES:
+        dot.edge(f"{stage}_review", TRANSITIONS[stage][0], label="✔ Approved")
     st.graphviz_chart(dot)
 
 # === Live Log ===
+LOG_PAGE_SIZE = 50
+
+
+def reset_log_page():
+    st.session_state.log_page = 1
+
+
 st.markdown("---")
 st.markdown("### 🟢 Live Log")
-if st.session_state.logs:
-    latest_log = next((log for log in reversed(st.session_state.logs) if any(kw in log for kw in ["▶️", "⏸️", "✅", "❌"])), st.session_state.logs[-1])
-    st.info(latest_log)
+latest_log = engine.logs.latest_status()
+if latest_log:
+    st.info(latest_log["message"])
 
 
+upload_status = engine.upload_status() if engine.config.get("github", {}).get("enabled") else None
+if upload_status:
+    status_col, refresh_col = st.columns([5, 1])
+    status_col.caption(upload_status)
+    if refresh_col.button("🔄 Refresh", key="refresh_upload_status"):
+        st.rerun()
+    if upload_status.startswith(("❌", "🔑")) and st.button("🔁 Retry GitHub upload", key="retry_upload"):
+        upload_queue.retry(engine.run_id, engine.config["github"].get("token"))
+        st.rerun()
+
 with st.expander("📜 Consolidated Workflow Logs"):
-    for line in st.session_state.logs:
-        st.write(line)
-        
+    filter_cols = st.columns([2, 2, 3])
+    log_levels = filter_cols[0].multiselect("Level", LEVELS, key="log_levels", on_change=reset_log_page)
+    log_stage = filter_cols[1].selectbox("Stage", ["All"] + engine.logs.stages(), key="log_stage", on_change=reset_log_page)
+    log_text = filter_cols[2].text_input("Contains", key="log_text", on_change=reset_log_page)
+    log_page = st.session_state.setdefault("log_page", 1)
+    records, total = engine.logs.query(
+        levels=log_levels, stage=None if log_stage == "All" else log_stage, text=log_text,
+        offset=(log_page - 1) * LOG_PAGE_SIZE, limit=LOG_PAGE_SIZE,
+    )
+    page_count = max((total + LOG_PAGE_SIZE - 1) // LOG_PAGE_SIZE, 1)
+    if log_page > page_count:
+        st.session_state.log_page = page_count
+        st.rerun()
+    st.caption(f"{total} entries, newest first · page {log_page} of {page_count}")
+    # One markdown block per page instead of one element per line
+    st.markdown("\n\n".join(record["message"] for record in records) or "_No log entries._")
+    if page_count > 1:
+        prev_col, next_col = st.columns(2)
+        if prev_col.button("⬅️ Newer", disabled=log_page <= 1, key="log_newer"):
+            st.session_state.log_page -= 1
+            st.rerun()
+        if next_col.button("Older ➡️", disabled=log_page >= page_count, key="log_older"):
+            st.session_state.log_page += 1
+            st.rerun()
+
+with st.expander("⏱️ Timings"):
+    run_spans = spans_sink.spans(engine.run_id)
+    if run_spans:
+        depth = {}
+        rows = []
+        # Spans come in start order, so a parent is always seen before its children
+        for record in run_spans:
+            depth[record["span_id"]] = depth.get(record["parent_id"], -1) + 1
+            values = dict(record["attributes"], **record["counters"])
+            rows.append({
+                "span": "  " * depth[record["span_id"]] + record["name"],
+                "stage": values.get("stage") or "",
+                "ms": record["duration_ms"],
+                "ttft ms": values.get("ttft_ms"),
+                "prompt tokens": values.get("prompt_tokens"),
+                "completion tokens": values.get("completion_tokens"),
+                "cache": values.get("cache") or "",
+                "cache hits": values.get("cache_hits"),
+                "retries": values.get("retries"),
+                "status": record["status"],
+            })
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+    else:
+        st.caption("No spans recorded for this run yet.")
+
 # === Trigger Node Execution ===
-if st.session_state.get("workflow_started") and st.session_state.get("current_node") != "END" and st.session_state.get("paused_stage") is None:
-    advance_node(user_input, user_file)
+if engine.workflow_started and not engine.is_finished and engine.paused_stage is None:
+    advance_node(user_input, user_file, run_to_pause=engine.config.get("run_to_pause", False))
 
 
 # === User Review UI ===
-stage = st.session_state.paused_stage
+stage = engine.paused_stage
 if stage:
     st.subheader(f"✍️ User Review for {stage.title()}")
     feedback = st.text_area("Provide feedback (if rejecting):", key=f"fb_{stage}")
     col1, col2 = st.columns(2)
     with col1:
         if st.button(f"✅ Approve {stage.title()}"):
-            st.session_state.approved[stage] = True
-            st.session_state.feedback[stage] = ""
-            next_map = {
-                "userstories": "design_gen",
-                "design": "code_gen",
-                "code": "review_gen",
-                "review": "qa_gen",
-                "qa": "END"
-            }
-            st.session_state.current_node = next_map.get(stage, "END")
-            st.session_state.paused_stage = None
+            engine.approve(stage)
             st.rerun()
     with col2:
         if st.button(f"❌ Reject {stage.title()}"):
-            st.session_state.approved[stage] = False
-            st.session_state.feedback[stage] = feedback
-            st.session_state.current_node = "code_gen" if stage in ["review", "qa"] else f"{stage}_gen"
-            st.session_state.paused_stage = None
+            engine.reject(stage, feedback)
             st.rerun()
 
 # === Workflow Summary ===
 st.markdown("---")
 st.markdown("### 📊 Workflow Summary")
 summary_cols = st.columns(5)
-for i, stage in enumerate(["userstories", "design", "code", "review", "qa"]):
-    status = st.session_state.approved.get(stage)
+for i, stage in enumerate(STAGES):
+    status = engine.approved.get(stage)
     if status is True:
         summary_cols[i].success(f"✔ {stage.title()}")
     elif status is False:
@@ -238,28 +517,28 @@ tabs = st.tabs([
     "🔍 Review",
     "✅ QA"
 ])
-for i, stage in enumerate(["userstories", "design", "code", "review", "qa"]):
+for i, stage in enumerate(STAGES):
     with tabs[i]:
         st.markdown(f"### 🧠 AI Generated {stage.title()} Output")
-        out = st.session_state.output.get(stage, "")
+        out = engine.output.get(stage, "")
         if out:
             st.markdown("```markdown" + out + "```")
         else:
             st.info("ℹ️ Waiting for the flow to Start.")
         
          # 💡 Show feedback used for this stage, if any
-        feedback_used = st.session_state.feedback.get(stage, "")
+        feedback_used = engine.feedback.get(stage, "")
         if feedback_used:
             st.markdown(f"#### 💡 Feedback Used")
             st.info(feedback_used)
             
         # ✅ Show approval decision and reason if available
-        decision = st.session_state.approved.get(stage)
+        decision = engine.approved.get(stage)
         if decision is True:
-            reason = st.session_state.get("review_reasons", {}).get(stage, "")
+            reason = engine.review_reasons.get(stage, "")
             st.markdown("#### ✅ Approved by AI/User")
             st.success(reason)
         elif decision is False:
-            reason = st.session_state.feedback.get(stage, "")
+            reason = engine.feedback.get(stage, "")
             st.markdown("#### ❌ Rejected by AI/User")
             st.error(reason)
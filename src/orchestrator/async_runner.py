@@ -0,0 +1,52 @@
+# async_runner.py (AIFlowCraft - Asyncio entry point for running many workflows)
+
+import asyncio
+
+from orchestrator.engine import WorkflowEngine, MAX_STEPS_PER_PASS
+
+# Default cap on LLM calls in flight across every workflow sharing a semaphore
+DEFAULT_LLM_CONCURRENCY = 32
+# Default cap on nodes one arun_workflow call executes, so a reviewer that
+# rejects forever cannot keep a workflow running indefinitely
+MAX_WORKFLOW_STEPS = 8 * MAX_STEPS_PER_PASS
+
+
+async def arun_workflow(engine: WorkflowEngine, user_input, user_file=None, semaphore=None,
+                       max_steps: int = MAX_STEPS_PER_PASS, max_total_steps: int = MAX_WORKFLOW_STEPS) -> WorkflowEngine:
+    """Start ``engine`` if needed and run it until a user review pause or ``END``.
+
+    Rejection loops are given further passes until the workflow pauses, ends,
+    stops making progress or has executed ``max_total_steps`` nodes.
+    """
+    if not engine.workflow_started:
+        engine.start()
+    total = 0
+    while not engine.is_finished and engine.paused_stage is None:
+        if total >= max_total_steps:
+            engine.logs.append(f"⚠️ Stopped after {total} steps without finishing; resume to continue.")
+            break
+        steps = await engine.arun_until_pause(user_input, user_file, semaphore, min(max_steps, max_total_steps - total))
+        if steps == 0:
+            break
+        total += steps
+    return engine
+
+
+async def run_briefs(briefs, config: dict, review_mode: dict = None, max_concurrency: int = DEFAULT_LLM_CONCURRENCY) -> list:
+    """Run one workflow per brief concurrently and return their engines.
+
+    ``briefs`` holds project brief strings or ``(brief, uploaded_file)`` pairs.
+    All workflows share one semaphore, so at most ``max_concurrency`` LLM calls
+    are in flight at a time regardless of the number of briefs.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    engines = []
+    jobs = []
+    for brief in briefs:
+        user_input, user_file = brief if isinstance(brief, tuple) else (brief, None)
+        engine = WorkflowEngine(config=dict(config), review_mode=dict(review_mode) if review_mode else None)
+        engines.append(engine)
+        jobs.append(arun_workflow(engine, user_input, user_file, semaphore))
+
+    await asyncio.gather(*jobs)
+    return engines
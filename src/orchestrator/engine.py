@@ -0,0 +1,490 @@
+# engine.py (AIFlowCraft - Headless workflow engine, no Streamlit dependency)
+
+import asyncio
+import uuid
+from contextlib import nullcontext
+
+from agents.user_input_agent import generate_user_stories, agenerate_user_stories
+from agents.design_agent import generate_design_doc, agenerate_design_doc
+from agents.code_agent import generate_code_snippet, agenerate_code_snippet
+from agents.review_agent import generate_review_summary, agenerate_review_summary
+from agents.qa_agent import run_qa_check, arun_qa_check
+from utils.review_utils import run_llm_review, arun_llm_review, parse_review_trailer, DEFAULT_FUSED_REVIEW_THRESHOLD
+from utils.github_helper import DEFAULT_API_URL, DEFAULT_BRANCH
+from utils.github_queue import format_job, get_upload_queue
+from utils.llm_runner import collect_llm_calls
+from utils.llm_cache import get_cache
+from utils.log_store import WorkflowLog
+from utils.tracing import span
+
+
+STAGES = ["userstories", "design", "code", "review", "qa"]
+
+# stage -> (node on approval, node on rejection)
+TRANSITIONS = {
+    "userstories": ("design_gen", "userstories_gen"),
+    "design": ("code_gen", "design_gen"),
+    "code": ("review_gen", "code_gen"),
+    "review": ("qa_gen", "code_gen"),
+    "qa": ("END", "code_gen"),
+}
+
+# stage -> agent function; the agents' parameter names describe which earlier
+# stage outputs each stage consumes (see orchestrator/scheduler.py)
+STAGE_AGENTS = {
+    "userstories": generate_user_stories,
+    "design": generate_design_doc,
+    "code": generate_code_snippet,
+    "review": generate_review_summary,
+    "qa": run_qa_check,
+}
+
+ASYNC_STAGE_AGENTS = {
+    "userstories": agenerate_user_stories,
+    "design": agenerate_design_doc,
+    "code": agenerate_code_snippet,
+    "review": agenerate_review_summary,
+    "qa": arun_qa_check,
+}
+
+# stage -> file its output is uploaded to, next to the generated code
+ARTIFACT_FILES = {
+    "userstories": "user_stories.md",
+    "design": "design.md",
+    "review": "review.md",
+    "qa": "qa_report.md",
+}
+DEFAULT_ARTIFACTS_DIR = "aiflowcraft"
+
+# Upper bound on nodes executed by one run_until_pause call, so an AI reviewer
+# that keeps rejecting still hands control back to the caller regularly.
+MAX_STEPS_PER_PASS = 25
+
+
+def default_config() -> dict:
+    return {"groq_api_key": None, "db_type": "none", "db_path": "", "run_to_pause": False}
+
+
+class WorkflowEngine:
+    """Holds the state of one workflow run and executes its node transitions.
+
+    The engine has no knowledge of Streamlit: ``main.py`` keeps one instance in
+    ``st.session_state`` and reruns the script when ``advance_node`` reports
+    progress, while workers and tests can drive it directly.
+    """
+
+    def __init__(self, config: dict = None, review_mode: dict = None):
+        self.config = config if config is not None else default_config()
+        self.review_mode = review_mode if review_mode is not None else {stage: "AI" for stage in STAGES}
+        self.workflow_started = False
+        self.output = {}
+        self.approved = {}
+        self.feedback = {}
+        self.review_reasons = {}
+        self.cache_stats = {"hits": 0, "misses": 0}
+        self._output_cache_keys = {}
+        self.logs = WorkflowLog()
+        self.current_node = "userstories_gen"
+        self.paused_stage = None
+        # Idempotency key of this run's GitHub upload
+        self.run_id = uuid.uuid4().hex
+        self.upload_queue = None
+
+    def start(self):
+        self.workflow_started = True
+        self.run_id = uuid.uuid4().hex
+        self.current_node = "userstories_gen"
+        self.paused_stage = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.current_node == "END"
+
+    def run_generation(self, stage, user_input, user_file):
+        out = self.generate_stage(stage, user_input, user_file)
+        self.current_node = f"{stage}_review"
+        return out
+
+    async def arun_generation(self, stage, user_input, user_file, semaphore=None):
+        out = await self.agenerate_stage(stage, user_input, user_file, semaphore)
+        self.current_node = f"{stage}_review"
+        return out
+
+    def generate_stage(self, stage, user_input, user_file):
+        """Run the agent for ``stage`` and store its output, without moving nodes."""
+        out, cache_keys = self._generate(stage, user_input, user_file)
+        self._store_output(stage, out, cache_keys)
+        return out
+
+    async def agenerate_stage(self, stage, user_input, user_file, semaphore=None):
+        out, cache_keys = await self._agenerate(stage, user_input, user_file, semaphore)
+        self._store_output(stage, out, cache_keys)
+        return out
+
+    def _generate(self, stage, user_input, user_file):
+        """``(output, cache keys)`` of one agent run for ``stage``, not stored yet."""
+        with span("generation", trace_id=self.run_id, stage=stage) as timing:
+            args = self._generation_args(stage, user_input, user_file)
+            with collect_llm_calls() as calls:
+                with span("agent", stage=stage, agent=STAGE_AGENTS[stage].__name__):
+                    out = STAGE_AGENTS[stage](*args)
+        self._log_generation(stage, timing, calls)
+        return out, [call["cache_key"] for call in calls if call["cache_key"]]
+
+    async def _agenerate(self, stage, user_input, user_file, semaphore=None):
+        with span("generation", trace_id=self.run_id, stage=stage) as timing:
+            # May read the reference database; keep it off the event loop
+            args = await asyncio.to_thread(self._generation_args, stage, user_input, user_file)
+            with collect_llm_calls() as calls:
+                async with semaphore or nullcontext():
+                    with span("agent", stage=stage, agent=ASYNC_STAGE_AGENTS[stage].__name__):
+                        out = await ASYNC_STAGE_AGENTS[stage](*args)
+        self._log_generation(stage, timing, calls)
+        return out, [call["cache_key"] for call in calls if call["cache_key"]]
+
+    def _log_generation(self, stage, timing, calls):
+        self._log_llm_calls(stage, calls)
+        self._log_reference(stage, timing)
+        self._log_timing(stage, "Generated", timing)
+
+    def _store_output(self, stage, out, cache_keys):
+        self._output_cache_keys[stage] = cache_keys
+        self.output[stage] = out
+
+    def _log_reference(self, stage, timing):
+        # Reported by the agent's own reference lookup (see utils/db_reference.py)
+        if timing.counters.get("reference_chars"):
+            self.logs.append(f"📦 Reference Data Used in {stage}: ✅ Database reference injected", stage=stage)
+        else:
+            self.logs.append(f"📦 Reference Data Used in {stage}: ❌ No DB reference available", stage=stage)
+
+    def _log_timing(self, stage, action, timing):
+        counters = timing.counters
+        details = f"{counters.get('llm_calls', 0)} LLM calls, {counters.get('cache_hits', 0)} cache hits"
+        if counters.get("retries"):
+            details += f", {counters['retries']} retries"
+        self.logs.append(f"⏱️ {action} {stage} in {timing.duration_ms / 1000:.2f}s ({details})", stage=stage)
+
+    def _call_settings(self, stage):
+        """Settings passed to the agent for one generation of ``stage``.
+
+        A stage that already has an output is being regenerated after a
+        rejection, so the response cache is bypassed for it: serving the
+        cached (rejected) response again would loop forever.
+        """
+        if stage not in self.output:
+            return self.config
+        return dict(self.config, cache_bypass=dict(self.config.get("cache_bypass", {}), **{stage: True}))
+
+    def _forget_cached_output(self, stage):
+        """Drop the cached responses behind a rejected output so they are not served again."""
+        for key in self._output_cache_keys.pop(stage, []):
+            get_cache().delete(key)
+
+    def _log_llm_calls(self, stage, calls):
+        for call in calls:
+            if call["cache"] == "hit":
+                self.cache_stats["hits"] += 1
+            elif call["cache"] == "miss":
+                self.cache_stats["misses"] += 1
+            self.logs.append(
+                f"🗃️ LLM cache [{stage}/{call['prompt_id']}]: {call['cache']} "
+                f"(hits {self.cache_stats['hits']} / misses {self.cache_stats['misses']})",
+                stage=stage,
+            )
+            self.logs.append(
+                f"🔢 Tokens [{stage}/{call['prompt_id']}]: prompt ~{call['prompt_tokens']} "
+                f"(budget {call['budget']}), completion ~{call['completion_tokens']}",
+                stage=stage,
+            )
+            for slot, (before, after) in call["trimmed"].items():
+                self.logs.append(f"✂️ Trimmed {slot} in {stage}/{call['prompt_id']}: ~{before} → ~{after} tokens", stage=stage)
+            if call["compacted"]:
+                self.logs.append(
+                    f"🗜️ Compacted {stage}/{call['prompt_id']}: {call['compacted']} repeated characters not sent",
+                    stage=stage,
+                )
+
+    def _generation_args(self, stage, user_input, user_file):
+        if stage not in STAGE_AGENTS:
+            raise ValueError(f"Unknown stage: {stage}")
+
+        self.logs.append(f"▶️ Generating {stage.title()}...", stage=stage)
+
+        feedback = self.feedback.get(stage, "")
+        config = self._call_settings(stage)
+
+        if feedback and feedback.lower() != "none":
+            feedback_text = f"📝 Feedback Acknowledged: {feedback}"
+            self.logs.append(f"💬 Feedback acknowledged for {stage}: {feedback}", stage=stage)
+        else:
+            feedback_text = ""
+
+        if stage in ("userstories", "design"):
+            return (user_input, user_file, config, feedback_text)
+        if stage == "code":
+            return (self.output.get("design"), user_input, user_file, config, feedback_text)
+        if stage == "review":
+            return (self.output.get("code"), config, feedback_text)
+        return (
+            self.output.get("userstories"),
+            self.output.get("design"),
+            self.output.get("code"),
+            config, feedback_text
+        )
+
+    def run_review(self, stage, next_node, fallback_node, user_input):
+        """Review ``stage`` and move to the next node.
+
+        Returns the AI decision, or ``None`` when the stage is paused for a
+        user review.
+        """
+        if self._pause_for_user(stage):
+            return None
+        decision = self.review_stage(stage, user_input)
+        self._apply_decision(stage, decision, next_node, fallback_node)
+        return decision
+
+    async def arun_review(self, stage, next_node, fallback_node, user_input, semaphore=None):
+        if self._pause_for_user(stage):
+            return None
+        decision = await self.areview_stage(stage, user_input, semaphore)
+        self._apply_decision(stage, decision, next_node, fallback_node)
+        return decision
+
+    def _pause_for_user(self, stage) -> bool:
+        if self.review_mode[stage] == "AI":
+            return False
+        self.paused_stage = stage
+        self.logs.append(f"⏸️ Waiting for User Review at: {stage}", stage=stage)
+        return True
+
+    def _apply_decision(self, stage, decision, next_node, fallback_node):
+        if decision == "APPROVED":
+            if stage == "qa":
+                self.upload_to_github()
+            self.current_node = next_node
+        else:
+            self.current_node = fallback_node
+
+    def review_stage(self, stage, user_input):
+        """Run the AI reviewer on ``stage`` and record approval or feedback."""
+        decision, reason = self.judge_stage(stage, user_input)
+        return self._record_review(stage, decision, reason)
+
+    async def areview_stage(self, stage, user_input, semaphore=None):
+        decision, reason = await self.ajudge_stage(stage, user_input, semaphore)
+        return self._record_review(stage, decision, reason)
+
+    def judge_stage(self, stage, user_input, output=None):
+        """``(decision, reason)`` of the AI reviewer (or fused trailer) for ``stage``, without recording it.
+
+        ``output`` defaults to the stored output of ``stage``.
+        """
+        output = self.output.get(stage, "") if output is None else output
+        with span("review", trace_id=self.run_id, stage=stage) as timing:
+            fused = self._fused_review(stage, output)
+            if fused:
+                decision, reason = fused
+            else:
+                with collect_llm_calls() as calls:
+                    with span("agent", stage=stage, agent="run_llm_review"):
+                        decision, reason = run_llm_review(**self._review_kwargs(stage, user_input, output))
+                self._log_llm_calls(stage, calls)
+            timing.set(decision=decision, fused=bool(fused))
+        self._log_timing(stage, "Reviewed", timing)
+        return decision, reason
+
+    async def ajudge_stage(self, stage, user_input, semaphore=None, output=None):
+        output = self.output.get(stage, "") if output is None else output
+        with span("review", trace_id=self.run_id, stage=stage) as timing:
+            fused = self._fused_review(stage, output)
+            if fused:
+                decision, reason = fused
+            else:
+                with collect_llm_calls() as calls:
+                    async with semaphore or nullcontext():
+                        with span("agent", stage=stage, agent="arun_llm_review"):
+                            decision, reason = await arun_llm_review(**self._review_kwargs(stage, user_input, output))
+                self._log_llm_calls(stage, calls)
+            timing.set(decision=decision, fused=bool(fused))
+        self._log_timing(stage, "Reviewed", timing)
+        return decision, reason
+
+    def _fused_review(self, stage, output):
+        """Use the generator's own Decision/Reason trailer when fused review is on.
+
+        Returns ``(decision, reason)``, or ``None`` when fused review is off for
+        ``stage`` or the trailer is too unclear and the separate reviewer
+        should run instead.
+        """
+        if not self.config.get("fused_review", {}).get(stage):
+            return None
+
+        threshold = self.config.get("fused_review_threshold", DEFAULT_FUSED_REVIEW_THRESHOLD)
+        decision, reason, confidence = parse_review_trailer(output)
+        if decision is None or confidence < threshold:
+            self.logs.append(f"🔁 Fused review [{stage}]: trailer unclear (confidence {confidence:.2f}), falling back to AI reviewer", stage=stage)
+            return None
+
+        self.logs.append(f"🧩 Fused review [{stage}]: using the generator's own decision (confidence {confidence:.2f})", stage=stage)
+        return decision, reason
+
+    def _review_kwargs(self, stage, user_input, output):
+        return dict(
+            stage_output=output,
+            stage_name=stage,
+            user_input=user_input,
+            feedback=self.feedback.get(stage, ""),
+            api_key=self.config["groq_api_key"],
+            settings=self.config
+        )
+
+    def _record_review(self, stage, decision, reason):
+        self.logs.append(f"🤖 AI Review [{stage}]: {decision} - {reason}", stage=stage)
+        self.review_reasons[stage] = reason
+
+        if decision == "APPROVED":
+            self.approved[stage] = True
+            self.feedback[stage] = ""
+            self.logs.append(f"✅ Approved by AI: {stage}", stage=stage)
+        else:
+            self.approved[stage] = False
+            self.feedback[stage] = reason
+            self._forget_cached_output(stage)
+            self.logs.append(f"❌ Rejected by AI: {stage}. Feedback saved.", stage=stage)
+        return decision
+
+    def approve(self, stage):
+        """Apply a user approval for the paused ``stage``."""
+        self.approved[stage] = True
+        self.feedback[stage] = ""
+        self.current_node = TRANSITIONS.get(stage, ("END", None))[0]
+        self.paused_stage = None
+
+    def reject(self, stage, feedback):
+        """Apply a user rejection for the paused ``stage``."""
+        self.approved[stage] = False
+        self.feedback[stage] = feedback
+        self._forget_cached_output(stage)
+        self.current_node = TRANSITIONS[stage][1]
+        self.paused_stage = None
+
+    def github_files(self, code_path):
+        """``(files, companions)``: repository path -> content of what is uploaded when the workflow completes.
+
+        The workflow log differs on every run, so it is a companion: it is
+        only committed when one of the generated artifacts changed.
+        """
+        github_cfg = self.config.get("github", {})
+        files = {code_path: self.output.get("code", "")}
+        companions = {}
+        if github_cfg.get("include_artifacts", True):
+            folder = github_cfg.get("artifacts_dir") or DEFAULT_ARTIFACTS_DIR
+            for stage, name in ARTIFACT_FILES.items():
+                if self.output.get(stage):
+                    files[f"{folder}/{name}"] = self.output[stage]
+            companions[f"{folder}/workflow_log.md"] = "\n".join(self.logs) + "\n"
+        return files, companions
+
+    def _upload_queue(self):
+        return self.upload_queue or get_upload_queue()
+
+    def upload_to_github(self):
+        """Queue the upload of this run's code and artifacts; the commit happens in the background."""
+        github_cfg = self.config.get("github", {})
+        if not github_cfg.get("enabled"):
+            return
+
+        token = github_cfg.get("token")
+        repo = github_cfg.get("repo")
+        path = github_cfg.get("path")
+        branch = github_cfg.get("branch") or DEFAULT_BRANCH
+
+        if token and repo and path:
+            try:
+                files, companions = self.github_files(path)
+                self.logs.append(
+                    f"🔧 Attempting GitHub upload with:\n- Repo: {repo}\n- Branch: {branch}\n- Files: {len(files) + len(companions)}\n- Token present: {'Yes' if token else 'No'}"
+                )
+                queue = self._upload_queue()
+                with span("github.enqueue", trace_id=self.run_id, repo=repo, branch=branch):
+                    job = queue.enqueue(
+                        self.run_id, token, repo, files,
+                        github_cfg.get("commit_message") or "Add generated code", companions,
+                        branch=branch, base_url=github_cfg.get("api_url") or DEFAULT_API_URL,
+                        on_status=lambda job: self.logs.append(format_job(job)),
+                    )
+                self.logs.append(format_job(job, queue.has_token(job)))
+            except Exception as e:
+                self.logs.append(f"❌ GitHub upload error: {str(e)}")
+        else:
+            self.logs.append("⚠️ Missing GitHub token, repo, or path.")
+
+    def upload_status(self):
+        """Current state of this run's GitHub upload as a log line, or ``None`` if nothing was queued."""
+        queue = self._upload_queue()
+        return queue.status_line(self.run_id)
+
+    def advance_node(self, user_input, user_file) -> bool:
+        """Execute the current node.
+
+        Returns ``True`` when the node ran and moved the workflow forward, and
+        ``False`` when it is paused for a user review or already at ``END``.
+        """
+        step = self._next_step()
+        if step is None:
+            return False
+
+        stage, kind = step
+        if kind == "gen":
+            self.run_generation(stage, user_input, user_file)
+            return True
+
+        next_node, fallback_node = TRANSITIONS[stage]
+        return self.run_review(stage, next_node, fallback_node, user_input) is not None
+
+    async def aadvance_node(self, user_input, user_file, semaphore=None) -> bool:
+        step = self._next_step()
+        if step is None:
+            return False
+
+        stage, kind = step
+        if kind == "gen":
+            await self.arun_generation(stage, user_input, user_file, semaphore)
+            return True
+
+        next_node, fallback_node = TRANSITIONS[stage]
+        return await self.arun_review(stage, next_node, fallback_node, user_input, semaphore) is not None
+
+    def _next_step(self):
+        node = self.current_node
+        if node == "END":
+            self.logs.append("🎯 Workflow completed successfully. All stages approved.")
+            return None
+
+        stage, _, kind = node.rpartition("_")
+        if stage not in TRANSITIONS or kind not in ("gen", "review"):
+            return None
+        return stage, kind
+
+    def run_until_pause(self, user_input, user_file, max_steps: int = MAX_STEPS_PER_PASS) -> int:
+        """Keep executing nodes until a user review pause, ``END`` or ``max_steps``.
+
+        Returns the number of nodes executed.
+        """
+        steps = 0
+        while steps < max_steps and not self.is_finished and self.paused_stage is None:
+            if not self.advance_node(user_input, user_file):
+                break
+            steps += 1
+        return steps
+
+    async def arun_until_pause(self, user_input, user_file, semaphore=None, max_steps: int = MAX_STEPS_PER_PASS) -> int:
+        """Async ``run_until_pause``; ``semaphore`` bounds LLM calls in flight."""
+        steps = 0
+        while steps < max_steps and not self.is_finished and self.paused_stage is None:
+            if not await self.aadvance_node(user_input, user_file, semaphore):
+                break
+            steps += 1
+        return steps
@@ -0,0 +1,238 @@
+# scheduler.py (AIFlowCraft - Dependency-aware parallel stage scheduler)
+
+import asyncio
+import contextvars
+import inspect
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from orchestrator.engine import WorkflowEngine, STAGES, STAGE_AGENTS, TRANSITIONS, MAX_STEPS_PER_PASS
+
+
+# Agent parameter name -> stage whose output is passed in that parameter
+ARTIFACT_PARAMS = {
+    "user_stories": "userstories",
+    "design_doc": "design",
+    "code": "code",
+    "code_snippet": "code",
+}
+
+DAG_NODE = "dag"
+
+
+def stage_dependencies(agents: dict = None) -> dict:
+    """Read each stage's data dependencies from its agent's signature."""
+    agents = agents if agents is not None else STAGE_AGENTS
+    deps = {}
+    for stage, agent in agents.items():
+        params = inspect.signature(agent).parameters
+        deps[stage] = {ARTIFACT_PARAMS[name] for name in params if name in ARTIFACT_PARAMS}
+    return deps
+
+
+def fallback_stage(stage: str) -> str:
+    """Stage that is regenerated when ``stage`` is rejected."""
+    return TRANSITIONS[stage][1].rsplit("_", 1)[0]
+
+
+class DagWorkflowEngine(WorkflowEngine):
+    """WorkflowEngine that runs independent stages concurrently.
+
+    A stage is generated as soon as every stage it takes as input has been
+    approved, so e.g. user stories and design run side by side. Approval gates
+    are unchanged: every stage still goes through its AI or user review, a
+    rejection regenerates the same fallback stage as the sequential flow, and
+    anything built on a regenerated stage is invalidated and rebuilt.
+    """
+
+    def __init__(self, config: dict = None, review_mode: dict = None, max_workers: int = None):
+        super().__init__(config, review_mode)
+        self.dependencies = stage_dependencies()
+        self.max_workers = max_workers or len(STAGES)
+        self._versions = {stage: 0 for stage in STAGES}
+        self._user_queue = []
+
+    def start(self):
+        super().start()
+        self.current_node = DAG_NODE
+        # A new run rebuilds every stage, e.g. for a new brief
+        self.approved = {}
+        self.feedback = {}
+        self.review_reasons = {}
+        self._versions = {stage: 0 for stage in STAGES}
+        self._user_queue = []
+
+    def dependents(self, stage) -> set:
+        """All stages that directly or transitively consume ``stage``."""
+        found = set()
+        frontier = [stage]
+        while frontier:
+            current = frontier.pop()
+            for other, deps in self.dependencies.items():
+                if current in deps and other not in found:
+                    found.add(other)
+                    frontier.append(other)
+        return found
+
+    def _in_user_review(self, stage) -> bool:
+        return stage == self.paused_stage or stage in self._user_queue
+
+    def _is_ready(self, stage, running) -> bool:
+        return (
+            stage not in running
+            and self.approved.get(stage) is not True
+            and not self._in_user_review(stage)
+            and all(self.approved.get(dep) is True for dep in self.dependencies[stage])
+        )
+
+    def _run_stage(self, stage, user_input, user_file):
+        """Worker: generate and judge ``stage``; output and verdict are published by ``_complete``."""
+        out, cache_keys = self._generate(stage, user_input, user_file)
+        verdict = self.judge_stage(stage, user_input, out) if self.review_mode[stage] == "AI" else None
+        return out, cache_keys, verdict
+
+    async def _arun_stage(self, stage, user_input, user_file, semaphore=None):
+        out, cache_keys = await self._agenerate(stage, user_input, user_file, semaphore)
+        verdict = await self.ajudge_stage(stage, user_input, semaphore, out) if self.review_mode[stage] == "AI" else None
+        return out, cache_keys, verdict
+
+    def _invalidate_dependents(self, stage):
+        for other in self.dependents(stage):
+            self.approved.pop(other, None)
+            if other in self._user_queue:
+                self._user_queue.remove(other)
+
+    def _apply_rejection(self, stage):
+        target = fallback_stage(stage)
+        if target != stage:
+            self.approved[target] = False
+        self._invalidate_dependents(target)
+
+    def _pause_next(self):
+        if self.paused_stage is None and self._user_queue:
+            self.paused_stage = self._user_queue.pop(0)
+            self.logs.append(f"⏸️ Waiting for User Review at: {self.paused_stage}", stage=self.paused_stage)
+
+    def _complete(self, stage, snapshot, result):
+        """Publish a finished stage on the scheduler thread.
+
+        Output, approval, feedback and the version bump happen together here,
+        so no dependent can start from a version that is about to change, and
+        output built from stale inputs is never shown or stored.
+        """
+        out, cache_keys, verdict = result
+        stale = any(
+            self._versions[dep] != version or self.approved.get(dep) is not True
+            for dep, version in snapshot.items()
+        )
+        self._versions[stage] += 1
+        if stale:
+            self.approved.pop(stage, None)
+            self.logs.append(f"♻️ Discarded {stage} output: its inputs changed while it was running.", stage=stage)
+            return
+
+        self._store_output(stage, out, cache_keys)
+        if verdict is None:
+            self._user_queue.append(stage)
+            self._pause_next()
+        elif self._record_review(stage, *verdict) != "APPROVED":
+            self._apply_rejection(stage)
+
+    def run_until_pause(self, user_input, user_file, max_steps: int = MAX_STEPS_PER_PASS) -> int:
+        """Run every stage whose inputs are approved, as many at a time as allowed.
+
+        Returns when the workflow is finished, ``max_steps`` stages have run, or
+        nothing more can start until a user review is answered.
+        """
+        steps = 0
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                if self._finish_if_done(running):
+                    steps += 1
+                    break
+
+                if steps < max_steps:
+                    for stage, snapshot in self._ready_stages(running):
+                        # Carry the caller's context so stage spans nest under its tracing span
+                        future = pool.submit(contextvars.copy_context().run, self._run_stage, stage, user_input, user_file)
+                        running[future] = (stage, snapshot)
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, snapshot = running.pop(future)
+                    steps += 1
+                    self._complete(stage, snapshot, future.result())
+        return steps
+
+    async def arun_until_pause(self, user_input, user_file, semaphore=None, max_steps: int = MAX_STEPS_PER_PASS) -> int:
+        """Async ``run_until_pause``: ready stages run as tasks; ``semaphore`` bounds LLM calls in flight."""
+        steps = 0
+        running = {}
+        try:
+            while True:
+                if self._finish_if_done(running):
+                    steps += 1
+                    break
+
+                if steps < max_steps:
+                    for stage, snapshot in self._ready_stages(running):
+                        task = asyncio.create_task(self._arun_stage(stage, user_input, user_file, semaphore))
+                        running[task] = (stage, snapshot)
+
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stage, snapshot = running.pop(task)
+                    steps += 1
+                    self._complete(stage, snapshot, task.result())
+        finally:
+            # A failed stage (or a cancelled caller) stops the stages still running
+            for task in running:
+                task.cancel()
+        return steps
+
+    def _finish_if_done(self, running) -> bool:
+        if running or not all(self.approved.get(stage) is True for stage in STAGES):
+            return False
+        self.current_node = "END"
+        self.upload_to_github()
+        return True
+
+    def _ready_stages(self, running) -> list:
+        """``(stage, snapshot of its inputs' versions)`` of every stage that can start now."""
+        running_stages = {stage for stage, _ in running.values()}
+        ready = []
+        for stage in STAGES:
+            if self._is_ready(stage, running_stages):
+                ready.append((stage, {dep: self._versions[dep] for dep in self.dependencies[stage]}))
+                running_stages.add(stage)
+        return ready
+
+    def advance_node(self, user_input, user_file) -> bool:
+        if self.is_finished:
+            return super().advance_node(user_input, user_file)
+        return self.run_until_pause(user_input, user_file) > 0
+
+    async def aadvance_node(self, user_input, user_file, semaphore=None) -> bool:
+        if self.is_finished:
+            return await super().aadvance_node(user_input, user_file, semaphore)
+        return await self.arun_until_pause(user_input, user_file, semaphore) > 0
+
+    def approve(self, stage):
+        self.approved[stage] = True
+        self.feedback[stage] = ""
+        self.paused_stage = None
+        self._pause_next()
+
+    def reject(self, stage, feedback):
+        self.approved[stage] = False
+        self.feedback[stage] = feedback
+        self._forget_cached_output(stage)
+        self.paused_stage = None
+        self._apply_rejection(stage)
+        self._pause_next()
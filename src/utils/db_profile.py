@@ -0,0 +1,194 @@
+# db_profile.py (AIFlowCraft - Column profiles of reference data tables)
+
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.db_sampling import format_value, quote_identifier, row_count, table_schema
+
+
+# Tables larger than this are profiled from rowid-range blocks, not scanned
+PROFILE_SCAN_LIMIT = 200000
+SAMPLE_BLOCKS = 20
+BLOCK_ROWS = 1000
+# Rows loaded into pandas for top values and quantiles
+PANDAS_SAMPLE_ROWS = 20000
+TOP_K = 3
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+MAX_CACHED_PROFILES = 256
+
+
+def _profile_source(conn, table: str, rows: int):
+    """``(sql, params, sampled)`` selecting the rows a profile is computed from."""
+    quoted = quote_identifier(table)
+    if rows <= PROFILE_SCAN_LIMIT:
+        return f"SELECT * FROM {quoted}", (), False
+    try:
+        low, high = conn.execute(f"SELECT min(rowid), max(rowid) FROM {quoted}").fetchone()
+    except Exception:
+        return f"SELECT * FROM {quoted} LIMIT {SAMPLE_BLOCKS * BLOCK_ROWS}", (), True
+    # Evenly spaced blocks of consecutive rowids, each read with a range seek.
+    # Each block stops where the next one starts, so sparse rowids never put a row in two blocks.
+    step = (high - low + 1) // SAMPLE_BLOCKS
+    parts, params = [], []
+    for i in range(SAMPLE_BLOCKS):
+        end = low + (i + 1) * step if i < SAMPLE_BLOCKS - 1 else high + 1
+        parts.append(
+            f"SELECT * FROM (SELECT * FROM {quoted} WHERE rowid >= ? AND rowid < ? ORDER BY rowid LIMIT {BLOCK_ROWS})"
+        )
+        params += [low + i * step, end]
+    return " UNION ALL ".join(parts), tuple(params), True
+
+
+def _aggregate(conn, columns, source, params) -> dict:
+    """Null count, distinct count, min and max of every column in one query."""
+    exprs = ["count(*)"]
+    for name in columns:
+        col = quote_identifier(name)
+        exprs += [f"count({col})", f"count(DISTINCT {col})", f"min({col})", f"max({col})"]
+    row = conn.execute(f"SELECT {', '.join(exprs)} FROM ({source})", params).fetchone()
+    total = row[0]
+    stats = {}
+    for i, name in enumerate(columns):
+        non_null, distinct, low, high = row[1 + 4 * i: 5 + 4 * i]
+        stats[name] = {
+            "null_rate": (1 - non_null / total) if total else 0.0,
+            "distinct": distinct,
+            "min": low,
+            "max": high,
+        }
+    return {"rows": total, "columns": stats}
+
+
+def _distribution(df, columns) -> dict:
+    """Top values and numeric quantiles per column of a pandas sample."""
+    result = {}
+    for name in columns:
+        series = df[name].dropna()
+        if series.empty or isinstance(series.iloc[0], (bytes, bytearray)):
+            continue
+        numeric = pd.to_numeric(series, errors="coerce")
+        if numeric.notna().mean() >= 0.9:
+            result[name] = {"quantiles": numeric.quantile(list(QUANTILES)).tolist()}
+            continue
+        counts = series.astype(str).value_counts(normalize=True).head(TOP_K)
+        if len(counts) and counts.iloc[0] * len(series) > 1:
+            result[name] = {"top": list(counts.items())}
+    return result
+
+
+def _value_columns(schema) -> list:
+    # Key columns are unique by construction; their distribution says nothing
+    return [col["name"] for col in schema["columns"] if not col["pk"]]
+
+
+def profile_sql(conn, table: str, schema: dict, estimated: int, exact: bool, source: str,
+                params=(), sampled: bool = False, sample_df=None) -> dict:
+    """Profile from one aggregate SQL query over ``source`` plus a pandas sample.
+
+    Works on any DB-API connection that speaks SQLite-compatible SQL;
+    ``sample_df`` defaults to the first ``PANDAS_SAMPLE_ROWS`` rows of ``source``.
+    """
+    columns = [col["name"] for col in schema["columns"]]
+    profile = _aggregate(conn, columns, source, params)
+    if sample_df is None:
+        sample_df = pd.read_sql_query(f"SELECT * FROM ({source}) LIMIT {PANDAS_SAMPLE_ROWS}", conn, params=params)
+    for name, extra in _distribution(sample_df, _value_columns(schema)).items():
+        profile["columns"][name].update(extra)
+    profile.update(table=table, schema=schema, estimated_rows=estimated, exact=exact, sampled=sampled)
+    return profile
+
+
+def profile_frame(df, table: str, schema: dict, estimated: int, exact: bool, sampled: bool) -> dict:
+    """Profile of a pandas DataFrame (the whole table or a sample of it), computed column-wise."""
+    total = len(df)
+    stats = {}
+    for col in schema["columns"]:
+        series = df[col["name"]]
+        non_null = series.dropna()
+        try:
+            low, high = (non_null.min(), non_null.max()) if len(non_null) else (None, None)
+        except TypeError:
+            # Mixed types cannot be ordered
+            low = high = None
+        stats[col["name"]] = {
+            "null_rate": (1 - len(non_null) / total) if total else 0.0,
+            "distinct": int(non_null.nunique()),
+            "min": low.item() if hasattr(low, "item") else low,
+            "max": high.item() if hasattr(high, "item") else high,
+        }
+    for name, extra in _distribution(df, _value_columns(schema)).items():
+        stats[name].update(extra)
+    return {
+        "rows": total, "columns": stats, "table": table, "schema": schema,
+        "estimated_rows": estimated, "exact": exact, "sampled": sampled,
+    }
+
+
+def profile_table(conn, table: str) -> dict:
+    """Statistical profile of one SQLite table: aggregate SQL plus a pandas pass over a sample."""
+    schema = table_schema(conn, table)
+    estimated, exact = row_count(conn, table)
+    source, params, sampled = _profile_source(conn, table, estimated)
+    return profile_sql(conn, table, schema, estimated, exact, source, params, sampled)
+
+
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def cached_profile(backend, content_hash: str, table: str) -> dict:
+    """``backend.profile(table)`` memoized by the data's content hash, so re-uploads of the same file reuse it."""
+    key = (content_hash, table)
+    with _profiles_lock:
+        if key in _profiles:
+            _profiles.move_to_end(key)
+            return _profiles[key]
+    profile = backend.profile(table)
+    with _profiles_lock:
+        _profiles[key] = profile
+        while len(_profiles) > MAX_CACHED_PROFILES:
+            _profiles.popitem(last=False)
+    return profile
+
+
+def _short(value) -> str:
+    value = format_value(value)
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    text = repr(value) if isinstance(value, str) else str(value)
+    return text if len(text) <= 40 else text[:40] + "…"
+
+
+def format_profile(profile: dict) -> str:
+    rows = f"{'' if profile['exact'] else '~'}{profile['estimated_rows']:,} rows"
+    if profile["sampled"]:
+        rows += f"; stats from a {profile['rows']:,}-row sample"
+    lines = [f"Profile {profile['table']} ({rows})"]
+    for col in profile["schema"]["columns"]:
+        stats = profile["columns"][col["name"]]
+        parts = [f"nulls {stats['null_rate']:.0%}", f"distinct {stats['distinct']:,}"]
+        if stats["min"] is not None and not isinstance(stats["min"], bytes):
+            parts.append(f"range {_short(stats['min'])}..{_short(stats['max'])}")
+        if "quantiles" in stats:
+            parts.append("p5/p25/p50/p75/p95 " + "/".join(_short(q) for q in stats["quantiles"]))
+        if "top" in stats:
+            parts.append("top " + ", ".join(f"{_short(v)} ({share:.0%})" for v, share in stats["top"]))
+        lines.append(f"  {col['name']} {col['type']}: " + ", ".join(parts))
+    return "\n".join(lines)
+
+
+def profile_database(backend, content_hash: str, max_chars: int) -> str:
+    """Profiles of every table of a reference backend that fit in ``max_chars`` characters."""
+    tables = backend.tables()
+    sections = []
+    used = 0
+    for i, table in enumerate(tables):
+        text = format_profile(cached_profile(backend, content_hash, table))
+        if used + len(text) + 2 > max_chars - 40:
+            sections.append(f"... {len(tables) - i} more tables not profiled")
+            break
+        sections.append(text)
+        used += len(text) + 2
+    return "\n\n".join(sections)
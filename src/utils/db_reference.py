@@ -1,35 +1,195 @@
-def get_db_reference_data(config: dict) -> str:
-    import sqlite3
+# db_reference.py (AIFlowCraft - Cached reference data from the connected database)
 
-    db_type = config.get("db_type")
-    db_path = config.get("db_path")
-    print("🔎 DB Type:", db_type)
-    print("📁 DB Path:", db_path)
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
 
-    if db_type != "sqlite" or not db_path:
-        return ""
+from utils.db_profile import profile_database
+from utils.db_sampling import DEFAULT_ROWS_PER_TABLE, reference_budget_chars, sample_database
+from utils.db_search import DEFAULT_SEARCH_ROWS, ensure_search_index, relevant_rows
+from utils.reference_backends import REFERENCE_BACKENDS, open_backend
+from utils.tracing import span
 
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
 
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        print("📊 Tables found:", tables)
+logger = logging.getLogger(__name__)
 
-        if not tables:
-            return ""
+MAX_CACHED_REFERENCES = 32
+
+# "rows": schema and sample rows, "profile": column statistics, "both": profile first, then rows
+REFERENCE_MODES = ("rows", "profile", "both")
+DEFAULT_REFERENCE_MODE = "both"
+# Share of the budget the profile may use in "both" mode
+PROFILE_SHARE = 0.6
+# Share of the budget kept for rows matching the request when a query is given
+SEARCH_SHARE = 0.4
+
+
+def db_fingerprint(db_path: str):
+    """``(path, mtime, size)`` of a database file; changes whenever the file is rewritten."""
+    path = os.path.abspath(db_path)
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+_content_hashes = {}
+_content_hashes_lock = threading.Lock()
+
+
+def db_content_hash(fingerprint) -> str:
+    """SHA-256 of a database file, computed once per fingerprint."""
+    with _content_hashes_lock:
+        if fingerprint in _content_hashes:
+            return _content_hashes[fingerprint]
+    digest = hashlib.sha256()
+    with open(fingerprint[0], "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    with _content_hashes_lock:
+        _content_hashes[fingerprint] = digest.hexdigest()
+    return _content_hashes[fingerprint]
+
+
+class ReadOnlyConnectionPool:
+    """One open read-only backend (see ``utils/reference_backends.py``) per reference file, shared by all threads.
+
+    A backend is reopened when the file's fingerprint changes. Queries
+    must run inside ``connection(...)``, which serialises access to it.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def connection(self, fingerprint, db_type: str = "sqlite"):
+        path = fingerprint[0]
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != (fingerprint, db_type):
+                if entry is not None:
+                    entry[1].close()
+                entry = ((fingerprint, db_type), open_backend(db_type, path), threading.Lock())
+                self._entries[path] = entry
+        return _LockedConnection(entry[1], entry[2])
+
+    def discard(self, db_path: str):
+        """Close the backend of ``db_path``, e.g. before the file is deleted."""
+        with self._lock:
+            entry = self._entries.pop(os.path.abspath(db_path), None)
+        if entry is not None:
+            with entry[2]:
+                entry[1].close()
+
+
+class _LockedConnection:
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        return self.conn
 
-        # Pick the first table
-        table_name = tables[0][0]
-        cursor.execute(f"SELECT * FROM {table_name} LIMIT 5;")
-        rows = cursor.fetchall()
-        col_names = [desc[0] for desc in cursor.description]
+    def __exit__(self, *exc):
+        self.lock.release()
 
-        result = "\n".join([str(dict(zip(col_names, row))) for row in rows])
-        conn.close()
-        return result
 
-    except Exception as e:
-        print("❌ DB ERROR:", e)
+connection_pool = ReadOnlyConnectionPool()
+
+_references = OrderedDict()
+_references_lock = threading.Lock()
+
+
+def _reference_options(config: dict) -> tuple:
+    mode = config.get("reference_mode", DEFAULT_REFERENCE_MODE)
+    if mode not in REFERENCE_MODES:
+        raise ValueError(f"Unknown reference mode: {mode}")
+    return mode, reference_budget_chars(config), config.get("reference_rows_per_table", DEFAULT_ROWS_PER_TABLE)
+
+
+def _build_reference(backend, fingerprint, mode, max_chars, rows_per_table) -> str:
+    if mode == "rows":
+        return sample_database(backend, max_chars, rows_per_table)
+    content_hash = db_content_hash(fingerprint)
+    if mode == "profile":
+        return profile_database(backend, content_hash, max_chars)
+    profile = profile_database(backend, content_hash, int(max_chars * PROFILE_SHARE))
+    rows = sample_database(backend, max_chars - len(profile) - 2, rows_per_table)
+    return f"{profile}\n\n{rows}"
+
+
+def build_search_index(config: dict):
+    """Create or update the FTS5 side index of the database in ``config``; returns its path or None."""
+    db_path = config.get("db_path")
+    if config.get("db_type") != "sqlite" or not db_path:
+        return None
+    fingerprint = db_fingerprint(db_path)
+    with connection_pool.connection(fingerprint) as backend:
+        return ensure_search_index(backend.conn, fingerprint)
+
+
+def get_db_reference_data(config: dict, query: str = None, stage: str = None) -> str:
+    """Reference text for the data source in ``config``, built once per version of the file.
+
+    ``db_type`` selects the backend (``utils/reference_backends.py``:
+    sqlite, csv, parquet or duckdb) that reads ``db_path``. Every table is
+    described within the budget from ``reference_char_budget`` /
+    ``reference_token_budget``: by its schema, row count and sample rows
+    (``utils/db_sampling.py``), by column statistics (``utils/db_profile.py``)
+    or both, as chosen by ``reference_mode``. With a ``query`` (the brief or
+    the artifact being worked on) the rows that best match it and ``stage``
+    are added from the FTS5 side index (``utils/db_search.py``) of SQLite
+    databases, unless ``reference_search`` is off.
+    """
+    db_type = config.get("db_type")
+    db_path = config.get("db_path")
+    logger.debug("🔎 DB Type: %s", db_type)
+    logger.debug("📁 DB Path: %s", db_path)
+
+    if db_type not in REFERENCE_BACKENDS or not db_path:
         return ""
+
+    with span("db_reference", db_type=db_type, stage=stage) as current:
+        try:
+            fingerprint = db_fingerprint(db_path)
+            options = _reference_options(config)
+            search = bool(query) and db_type == "sqlite" and config.get("reference_search", True)
+            key = (fingerprint, db_type, options, (query, stage) if search else None)
+            with _references_lock:
+                if key in _references:
+                    _references.move_to_end(key)
+                    current.set(cache="hit", chars=len(_references[key]))
+                    # Rolls up into the caller's span, e.g. to report what a stage was given
+                    current.add("reference_chars", len(_references[key]))
+                    return _references[key]
+
+            mode, max_chars, rows_per_table = options
+            with connection_pool.connection(fingerprint, db_type) as backend:
+                relevant = ""
+                if search:
+                    index_path = ensure_search_index(backend.conn, fingerprint)
+                    relevant = relevant_rows(
+                        backend.conn, index_path, query, stage, int(max_chars * SEARCH_SHARE),
+                        config.get("reference_search_rows", DEFAULT_SEARCH_ROWS),
+                    )
+                result = _build_reference(backend, fingerprint, mode, max_chars - len(relevant), rows_per_table)
+            if relevant:
+                result = f"{result}\n\nRows most relevant to this request:\n{relevant}"
+            logger.debug("📊 Reference data for %s: %d characters", fingerprint[0], len(result))
+            current.set(cache="miss", chars=len(result), search=bool(relevant))
+            current.add("reference_chars", len(result))
+
+            with _references_lock:
+                # Older versions of the same file can never be served again
+                for old in [old for old in _references if old[0][0] == fingerprint[0] and old[0] != fingerprint]:
+                    del _references[old]
+                _references[key] = result
+                while len(_references) > MAX_CACHED_REFERENCES:
+                    _references.popitem(last=False)
+            return result
+
+        except Exception as e:
+            logger.warning("❌ DB ERROR: %s", e)
+            current.status, current.error = "error", str(e)
+            return ""
@@ -0,0 +1,194 @@
+# db_sampling.py (AIFlowCraft - Schema-aware sampling of reference databases)
+
+import random
+
+from utils.token_budget import CHARS_PER_TOKEN
+
+
+DEFAULT_REFERENCE_CHARS = 6000
+DEFAULT_ROWS_PER_TABLE = 5
+MAX_CELL_CHARS = 120
+
+# Tables that ANALYZE found smaller than this are counted exactly anyway
+EXACT_COUNT_LIMIT = 100000
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def list_tables(conn) -> list:
+    """User tables of a SQLite database, without SQLite's internal tables."""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def table_schema(conn, table: str) -> dict:
+    """Columns (name, declared type, primary key) and foreign keys of ``table``."""
+    quoted = quote_identifier(table)
+    columns = [
+        {"name": row[1], "type": row[2] or "ANY", "pk": bool(row[5])}
+        for row in conn.execute(f"PRAGMA table_info({quoted})")
+    ]
+    foreign_keys = [
+        {"column": row[3], "table": row[2], "to": row[4]}
+        for row in conn.execute(f"PRAGMA foreign_key_list({quoted})")
+    ]
+    return {"columns": columns, "foreign_keys": foreign_keys}
+
+
+def _has_rowid(conn, table: str) -> bool:
+    try:
+        conn.execute(f"SELECT rowid FROM {quote_identifier(table)} LIMIT 0")
+        return True
+    except Exception:
+        return False
+
+
+def _analyzed_rows(conn, table: str):
+    """Row count recorded by ``ANALYZE`` in ``sqlite_stat1``, or ``None`` if the table was never analyzed."""
+    try:
+        rows = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ?", (table,)).fetchall()
+    except Exception:
+        return None  # no sqlite_stat1 table: ANALYZE never ran
+    counts = [int(stat.split()[0]) for (stat,) in rows if stat and stat.split()[0].isdigit()]
+    return max(counts) if counts else None
+
+
+def row_count(conn, table: str):
+    """``(rows, exact)`` for ``table``.
+
+    Uses the statistics of a previous ``ANALYZE`` when the database has
+    them; otherwise counts exactly. SQLite answers ``count(*)`` from the
+    smallest index b-tree, not by reading the rows. Rowid ranges are never
+    used as a count: keys such as timestamps leave huge gaps.
+    """
+    analyzed = _analyzed_rows(conn, table)
+    if analyzed is not None and analyzed > EXACT_COUNT_LIMIT:
+        return analyzed, False
+    return conn.execute(f"SELECT count(*) FROM {quote_identifier(table)}").fetchone()[0], True
+
+
+def sample_rows(conn, table: str, rows: int, total: int) -> tuple:
+    """Up to ``rows`` representative rows of ``table``; returns ``(column names, rows)``.
+
+    Small tables return their first rows. Larger rowid tables are sampled at
+    random rowids spread over the whole table, each fetched through the rowid
+    index. The positions are seeded from the table name, so the same
+    database always yields the same sample (and the same prompt).
+    """
+    quoted = quote_identifier(table)
+    if total <= rows or rows <= 0 or not _has_rowid(conn, table):
+        cursor = conn.execute(f"SELECT * FROM {quoted} LIMIT ?", (max(rows, 0),))
+        return [d[0] for d in cursor.description], cursor.fetchall()
+
+    low, high = conn.execute(f"SELECT min(rowid), max(rowid) FROM {quoted}").fetchone()
+    rng = random.Random(table)
+    step = (high - low + 1) / rows
+    found = {}
+    columns = None
+    for i in range(rows):
+        target = low + int(step * i + rng.random() * step)
+        cursor = conn.execute(
+            f"SELECT rowid, * FROM {quoted} WHERE rowid >= ? ORDER BY rowid LIMIT 1", (target,)
+        )
+        row = cursor.fetchone()
+        columns = columns or [d[0] for d in cursor.description[1:]]
+        if row is not None:
+            found[row[0]] = row[1:]
+    return columns or [], [found[key] for key in sorted(found)]
+
+
+def page_rows(conn, table: str, after=None, limit: int = 20) -> tuple:
+    """One page of ``table`` for browsing; returns ``(column names, rows, key of the next page)``.
+
+    Rowid tables are paged with keyset queries (``rowid > last seen``), so
+    every page costs one index seek however deep it is; other tables fall
+    back to ``OFFSET``. The next key is None on the last page.
+    """
+    quoted = quote_identifier(table)
+    if _has_rowid(conn, table):
+        cursor = conn.execute(
+            f"SELECT rowid, * FROM {quoted} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (after if after is not None else -(2 ** 63), limit),
+        )
+        rows = cursor.fetchall()
+        columns = [d[0] for d in cursor.description[1:]]
+        next_key = rows[-1][0] if len(rows) == limit else None
+        return columns, [row[1:] for row in rows], next_key
+    offset = after or 0
+    cursor = conn.execute(f"SELECT * FROM {quoted} LIMIT ? OFFSET ?", (limit, offset))
+    rows = cursor.fetchall()
+    return [d[0] for d in cursor.description], rows, (offset + limit if len(rows) == limit else None)
+
+
+def format_value(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<blob {len(value)} bytes>"
+    if isinstance(value, str) and len(value) > MAX_CELL_CHARS:
+        return value[:MAX_CELL_CHARS] + "…"
+    return value
+
+
+def format_row(columns, row) -> str:
+    return str({name: format_value(value) for name, value in zip(columns, row)})
+
+
+def describe_table(table: str, schema: dict, rows: int, exact: bool) -> str:
+    columns = ", ".join(
+        f"{col['name']} {col['type']}" + (" PK" if col["pk"] else "") for col in schema["columns"]
+    )
+    lines = [f"Table {table} ({'' if exact else '~'}{rows:,} rows)", f"  Columns: {columns}"]
+    if schema["foreign_keys"]:
+        keys = ", ".join(f"{fk['column']} -> {fk['table']}.{fk['to']}" for fk in schema["foreign_keys"])
+        lines.append(f"  Foreign keys: {keys}")
+    return "\n".join(lines)
+
+
+def reference_budget_chars(settings: dict) -> int:
+    """Character budget for reference data: ``reference_char_budget`` or ``reference_token_budget`` in settings."""
+    if settings.get("reference_char_budget"):
+        return settings["reference_char_budget"]
+    if settings.get("reference_token_budget"):
+        return settings["reference_token_budget"] * CHARS_PER_TOKEN
+    return DEFAULT_REFERENCE_CHARS
+
+
+def sample_database(backend, max_chars: int = DEFAULT_REFERENCE_CHARS, rows_per_table: int = DEFAULT_ROWS_PER_TABLE) -> str:
+    """Describe every table of a reference backend within ``max_chars`` characters.
+
+    ``backend`` is a ``utils/reference_backends.py`` backend. The schema of
+    each table (column types, foreign keys, row count) comes first; sample
+    rows are then added one per table in turn, so a budget that runs out
+    still leaves every table with some rows. With ``rows_per_table`` 0
+    only the schemas are described.
+    """
+    tables = backend.tables()
+    headers = []
+    samples = []
+    used = 0
+    for i, table in enumerate(tables):
+        rows, exact = backend.row_count(table)
+        header = describe_table(table, backend.schema(table), rows, exact)
+        # Leave room for the "... more tables" line
+        if used + len(header) + 2 > max_chars - 40:
+            headers.append(f"... {len(tables) - i} more tables not shown")
+            break
+        headers.append(header)
+        used += len(header) + 2
+        columns, sample = backend.sample_rows(table, rows_per_table, rows) if rows and rows_per_table > 0 else ([], [])
+        samples.append([format_row(columns, row) for row in sample])
+
+    blocks = [[header, "  Sample rows:"] for header in headers[:len(samples)]]
+    used += sum(len("  Sample rows:") + 1 for sample in samples if sample)
+    for depth in range(rows_per_table):
+        for block, sample in zip(blocks, samples):
+            if depth < len(sample) and used + len(sample[depth]) + 5 <= max_chars:
+                block.append(f"    {sample[depth]}")
+                used += len(sample[depth]) + 5
+
+    sections = ["\n".join(block if len(block) > 2 else block[:1]) for block in blocks]
+    sections.extend(headers[len(samples):])
+    return "\n\n".join(sections)
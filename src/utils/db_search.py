@@ -0,0 +1,173 @@
+# db_search.py (AIFlowCraft - FTS5 relevance index over reference databases)
+
+import hashlib
+import json
+import sqlite3
+import threading
+
+from utils.db_sampling import format_row, list_tables, quote_identifier, table_schema
+from utils.retrieval import STAGE_QUERIES, tokenize
+
+
+FTS_SUFFIX = ".fts"
+TEXT_TYPES = ("CHAR", "CLOB", "TEXT", "ANY")
+# Only the first rows of very large tables are indexed
+MAX_INDEXED_ROWS = 500000
+MAX_QUERY_TERMS = 64
+DEFAULT_SEARCH_ROWS = 10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS row_hashes (
+    tbl TEXT NOT NULL, rid INTEGER NOT NULL, hash INTEGER NOT NULL, fts_rowid INTEGER NOT NULL,
+    PRIMARY KEY (tbl, rid)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(body, tbl UNINDEXED, rid UNINDEXED, tokenize='porter unicode61');
+"""
+
+_path_locks = {}
+_path_locks_lock = threading.Lock()
+
+
+def fts_path(db_path: str) -> str:
+    """The side index lives next to the database: ``<db>.fts``."""
+    return db_path + FTS_SUFFIX
+
+
+def _lock_for(path):
+    with _path_locks_lock:
+        return _path_locks.setdefault(path, threading.Lock())
+
+
+def text_columns(schema: dict) -> list:
+    return [col["name"] for col in schema["columns"] if any(t in col["type"].upper() for t in TEXT_TYPES)]
+
+
+def _row_hash(body: str) -> int:
+    return int.from_bytes(hashlib.blake2b(body.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def _get_meta(index, key):
+    row = index.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(index, key, value):
+    index.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def _drop_table(index, table):
+    index.execute("DELETE FROM fts WHERE rowid IN (SELECT fts_rowid FROM row_hashes WHERE tbl = ?)", (table,))
+    index.execute("DELETE FROM row_hashes WHERE tbl = ?", (table,))
+    index.execute("DELETE FROM meta WHERE key = ?", (f"columns:{table}",))
+
+
+def _sync_table(conn, index, table, columns) -> int:
+    """Bring the index of one table up to date; returns the number of rows (re)indexed."""
+    signature = json.dumps(columns)
+    if _get_meta(index, f"columns:{table}") != signature:
+        _drop_table(index, table)
+        _set_meta(index, f"columns:{table}", signature)
+
+    known = {
+        rid: (row_hash, fts_rowid)
+        for rid, row_hash, fts_rowid in index.execute(
+            "SELECT rid, hash, fts_rowid FROM row_hashes WHERE tbl = ?", (table,)
+        )
+    }
+    selected = ", ".join(quote_identifier(name) for name in columns)
+    changed = 0
+    seen = set()
+    rows = conn.execute(f"SELECT rowid, {selected} FROM {quote_identifier(table)} ORDER BY rowid LIMIT ?", (MAX_INDEXED_ROWS,))
+    for rid, *values in rows:
+        seen.add(rid)
+        body = "\n".join(str(v) for v in values if v is not None and not isinstance(v, bytes))
+        row_hash = _row_hash(body)
+        old = known.get(rid)
+        if old is not None and old[0] == row_hash:
+            continue
+        if old is not None:
+            index.execute("DELETE FROM fts WHERE rowid = ?", (old[1],))
+        cursor = index.execute("INSERT INTO fts (body, tbl, rid) VALUES (?, ?, ?)", (body, table, rid))
+        index.execute(
+            "INSERT OR REPLACE INTO row_hashes (tbl, rid, hash, fts_rowid) VALUES (?, ?, ?, ?)",
+            (table, rid, row_hash, cursor.lastrowid),
+        )
+        changed += 1
+
+    for rid in known.keys() - seen:
+        index.execute("DELETE FROM fts WHERE rowid = ?", (known[rid][1],))
+        index.execute("DELETE FROM row_hashes WHERE tbl = ? AND rid = ?", (table, rid))
+        changed += 1
+    return changed
+
+
+def ensure_search_index(conn, fingerprint) -> str:
+    """Create or incrementally update the FTS5 index of a database; returns its path.
+
+    ``conn`` is a connection to the database, ``fingerprint`` its
+    ``(path, mtime, size)``. Nothing is read when the index already matches
+    the fingerprint. Otherwise every text column of every rowid table is
+    re-read, but only rows whose content changed are written to the index.
+    """
+    path = fts_path(fingerprint[0])
+    with _lock_for(path):
+        index = sqlite3.connect(path)
+        try:
+            index.executescript(_SCHEMA)
+            stamp = json.dumps(list(fingerprint[1:]))
+            if _get_meta(index, "fingerprint") == stamp:
+                return path
+
+            tables = []
+            for table in list_tables(conn):
+                columns = text_columns(table_schema(conn, table))
+                try:
+                    conn.execute(f"SELECT rowid FROM {quote_identifier(table)} LIMIT 0")
+                except sqlite3.Error:
+                    columns = []  # WITHOUT ROWID tables cannot be looked up by rowid
+                if columns:
+                    tables.append(table)
+                    _sync_table(conn, index, table, columns)
+
+            stale = [row[0] for row in index.execute("SELECT DISTINCT tbl FROM row_hashes")]
+            for table in set(stale) - set(tables):
+                _drop_table(index, table)
+            _set_meta(index, "fingerprint", stamp)
+            index.commit()
+            return path
+        finally:
+            index.close()
+
+
+def search_rows(index_path: str, query: str, stage: str = None, limit: int = DEFAULT_SEARCH_ROWS) -> list:
+    """``(table, rowid)`` of the rows that best match ``query`` and ``stage``, best first."""
+    terms = list(dict.fromkeys(tokenize(f"{query} {STAGE_QUERIES.get(stage, '')}")))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    match = " OR ".join(f'"{term}"' for term in terms)
+    index = sqlite3.connect(index_path)
+    try:
+        return index.execute(
+            "SELECT tbl, rid FROM fts WHERE fts MATCH ? ORDER BY bm25(fts) LIMIT ?", (match, limit)
+        ).fetchall()
+    finally:
+        index.close()
+
+
+def relevant_rows(conn, index_path: str, query: str, stage: str, max_chars: int,
+                  limit: int = DEFAULT_SEARCH_ROWS) -> str:
+    """The rows most relevant to ``query`` and ``stage``, formatted within ``max_chars``."""
+    lines = []
+    used = 0
+    for table, rid in search_rows(index_path, query, stage, limit):
+        cursor = conn.execute(f"SELECT * FROM {quote_identifier(table)} WHERE rowid = ?", (rid,))
+        row = cursor.fetchone()
+        if row is None:
+            continue
+        line = f"{table}: {format_row([d[0] for d in cursor.description], row)}"
+        if used + len(line) + 1 > max_chars:
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
@@ -0,0 +1,228 @@
+# document_extraction.py (AIFlowCraft - Uploaded document text extraction)
+
+import atexit
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import docx2txt
+import PyPDF2
+
+from utils.tracing import span
+
+
+# Total characters of extracted text kept in the shared cache
+DEFAULT_CACHE_CHARS = 20_000_000
+
+SUPPORTED_KINDS = (".pdf", ".docx")
+
+# PDFs with at least this many pages are split across worker processes
+PARALLEL_PAGE_THRESHOLD = 32
+PAGES_PER_TASK = 16
+PDF_WORKERS = int(os.getenv("AIFLOWCRAFT_PDF_WORKERS", str(os.cpu_count() or 1)))
+
+
+def read_upload_bytes(uploaded_file) -> bytes:
+    """Return the full contents of an upload without moving its read position."""
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    position = uploaded_file.tell()
+    uploaded_file.seek(0)
+    data = uploaded_file.read()
+    uploaded_file.seek(position)
+    return data
+
+
+def document_kind(uploaded_file) -> str:
+    name = (getattr(uploaded_file, "name", "") or "").lower()
+    return next((kind for kind in SUPPORTED_KINDS if name.endswith(kind)), "")
+
+
+class ExtractionCache:
+    """Extracted text keyed by the SHA-256 of the file bytes, shared process-wide.
+
+    The same document uploaded in several sessions, or passed to every stage
+    and rejection loop of a workflow, is parsed only once. The least recently
+    used texts are dropped once the cache holds more than ``max_chars``.
+    """
+
+    def __init__(self, max_chars: int = DEFAULT_CACHE_CHARS):
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key, text):
+        with self._lock:
+            if key in self._entries:
+                self._chars -= len(self._entries.pop(key))
+            self._entries[key] = text
+            self._chars += len(text)
+            while self._chars > self.max_chars and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+
+extraction_cache = ExtractionCache()
+
+_extracting = {}
+_extracting_lock = threading.Lock()
+
+
+@contextmanager
+def _extraction_slot(digest: str):
+    """Let one extraction of a document run at a time; the others wait and then find its text cached."""
+    with _extracting_lock:
+        slot = _extracting.setdefault(digest, [threading.Lock(), 0])
+        slot[1] += 1
+    try:
+        with slot[0]:
+            yield
+    finally:
+        with _extracting_lock:
+            slot[1] -= 1
+            if not slot[1]:
+                del _extracting[digest]
+
+
+# Parsed PDFs kept by each worker process, so the ranges of one document share a parse
+WORKER_READERS = 2
+
+_worker_readers = OrderedDict()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _pdf_pool() -> ProcessPoolExecutor:
+    """One worker pool for the whole process, started on first use.
+
+    Workers come from a fresh forkserver (or spawn) process rather than a
+    fork of the app, whose threads and open connections must not be copied.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context(method))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> list:
+    reader = _worker_readers.get(path)
+    if reader is None:
+        with open(path, "rb") as f:
+            reader = PyPDF2.PdfReader(io.BytesIO(f.read()))
+        _worker_readers[path] = reader
+        while len(_worker_readers) > WORKER_READERS:
+            _worker_readers.popitem(last=False)
+    else:
+        _worker_readers.move_to_end(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def iter_pdf_text(data: bytes, page_limit: int = None, char_limit: int = None, pages_per_task: int = PAGES_PER_TASK):
+    """Yield the text of each PDF page in order.
+
+    Large PDFs are split into ranges of ``pages_per_task`` pages that the
+    shared process pool extracts in parallel, while pages are still yielded
+    in order as soon as their range is done. Only the first ``page_limit``
+    pages are read, and the text stops once ``char_limit`` characters have
+    been yielded.
+    """
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+    if page_limit:
+        page_count = min(page_count, page_limit)
+
+    futures, path = [], None
+    if page_count >= PARALLEL_PAGE_THRESHOLD and PDF_WORKERS > 1:
+        # Workers read the document from disk instead of receiving it with every range
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        pool = _pdf_pool()
+        futures = [
+            pool.submit(_extract_page_range, path, start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ]
+        batches = (future.result() for future in futures)
+    else:
+        batches = ([reader.pages[i].extract_text() or ""] for i in range(page_count))
+
+    emitted = 0
+    try:
+        for batch in batches:
+            for text in batch:
+                if char_limit and emitted + len(text) >= char_limit:
+                    yield text[:char_limit - emitted]
+                    return
+                emitted += len(text)
+                yield text
+    finally:
+        for future in futures:
+            future.cancel()
+        if path is not None:
+            # Only ranges whose result is no longer wanted can still be running
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _extract(kind, data: bytes, page_limit: int = None, char_limit: int = None) -> str:
+    if kind == ".pdf":
+        return "\n".join(iter_pdf_text(data, page_limit, char_limit))
+    if kind == ".docx":
+        text = docx2txt.process(io.BytesIO(data))
+        return text[:char_limit] if char_limit else text
+    return ""
+
+
+def extract_text_from_file(uploaded_file, page_limit: int = None, char_limit: int = None) -> str:
+    if uploaded_file is None:
+        return ""
+
+    kind = document_kind(uploaded_file)
+    if not kind:
+        return ""
+
+    with span("document_extraction", kind=kind) as current:
+        data = read_upload_bytes(uploaded_file)
+        digest = hashlib.sha256(data).hexdigest()
+        key = (digest, kind, page_limit or None, char_limit or None)
+        text = extraction_cache.get(key)
+        current.set(cache="miss" if text is None else "hit", bytes=len(data))
+        if text is None:
+            with _extraction_slot(digest):
+                text = extraction_cache.get(key)
+                if text is None:
+                    text = _extract(kind, data, page_limit, char_limit)
+                    extraction_cache.put(key, text)
+                else:
+                    current.set(cache="wait")
+        current.set(chars=len(text))
+    return text
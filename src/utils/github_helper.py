@@ -1,26 +1,175 @@
 import requests
 import base64
+import hashlib
+import logging
+import threading
 
-def upload_file_to_github(token, repo, file_path, content, commit_message="Add generated code"):
-    url = f"https://api.github.com/repos/{repo}/contents/{file_path}"
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_API_URL = "https://api.github.com"
+DEFAULT_BRANCH = "main"
+DEFAULT_TIMEOUT = 30
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide ``requests.Session`` so GitHub calls reuse pooled keep-alive connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def git_blob_sha(content) -> str:
+    """The SHA git (and GitHub) gives a file with this content: sha1 of ``"blob <size>\\0" + bytes``."""
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class GitHubError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(f"GitHub API error {status}: {message}")
+        self.status = status
+        self.message = message
+        # Response headers, for Retry-After and X-RateLimit-* handling
+        self.headers = headers or {}
+
+
+class GitHubUploader:
+    """Commits any number of files to one branch in a single commit.
+
+    Uses the Git Data API (refs, commits, trees) instead of one contents
+    call per file: the new files are sent inline in one tree request, then
+    a commit is created on top of the branch head and the branch ref moved
+    to it. ``base_url`` can point at a local stand-in server for testing.
+    """
+
+    def __init__(self, token, repo, branch=DEFAULT_BRANCH, base_url=DEFAULT_API_URL,
+                 session=None, timeout=DEFAULT_TIMEOUT):
+        self.repo = repo
+        self.branch = branch
+        self.base_url = base_url.rstrip("/")
+        self.session = session or get_session()
+        self.timeout = timeout
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json",
+        }
+
+    def _request(self, method, path, **kwargs):
+        url = f"{self.base_url}/repos/{self.repo}" + (f"/{path}" if path else "")
+        response = self.session.request(method, url, headers=self.headers, timeout=self.timeout, **kwargs)
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("message", response.text)
+            except ValueError:
+                message = response.text
+            raise GitHubError(response.status_code, message, response.headers)
+        return response.json() if response.content else {}
+
+    def head(self, branch=None):
+        """``(commit sha, tree sha)`` of a branch head, or ``(None, None)`` if the branch does not exist."""
+        try:
+            ref = self._request("GET", f"git/ref/heads/{branch or self.branch}")
+        except GitHubError as e:
+            if e.status in (404, 409):  # 409: the repository is empty
+                return None, None
+            raise
+        commit_sha = ref["object"]["sha"]
+        commit = self._request("GET", f"git/commits/{commit_sha}")
+        return commit_sha, commit["tree"]["sha"]
+
+    def remote_blobs(self, tree_sha) -> dict:
+        """Path -> blob SHA of every file in a tree, from one recursive tree listing."""
+        listing = self._request("GET", f"git/trees/{tree_sha}", params={"recursive": "1"})
+        # A truncated listing only means some unchanged files get uploaded again
+        return {entry["path"]: entry["sha"] for entry in listing.get("tree", []) if entry.get("type") == "blob"}
+
+    def commit_files(self, files: dict, message: str, companions: dict = None) -> dict:
+        """Commit the files (path -> text content) that differ from the branch head.
+
+        Files whose git blob SHA matches the remote one are left out, and no
+        commit is made at all when nothing changed. ``companions`` (e.g. a
+        run log) are only committed together with at least one changed file.
+        Returns ``{"commit": sha or None, "files": [committed paths],
+        "unchanged": [skipped paths]}``.
+        """
+        parent, base_tree = self.head()
+        new_branch = parent is None
+        if new_branch:
+            # Start a missing branch from the repository's default branch
+            default_branch = self._request("GET", "").get("default_branch")
+            if default_branch and default_branch != self.branch:
+                parent, base_tree = self.head(default_branch)
+
+        remote = self.remote_blobs(base_tree) if base_tree else {}
+        changed = {path: content for path, content in files.items() if remote.get(path) != git_blob_sha(content)}
+        unchanged = sorted(set(files) - set(changed))
+        if not changed:
+            return {"commit": None, "files": [], "unchanged": unchanged}
+        changed.update(companions or {})
+
+        entries = [
+            {"path": path, "mode": "100644", "type": "blob", "content": content}
+            for path, content in changed.items()
+        ]
+        tree_request = {"tree": entries}
+        if base_tree:
+            tree_request["base_tree"] = base_tree
+        tree = self._request("POST", "git/trees", json=tree_request)
+
+        commit = self._request("POST", "git/commits", json={
+            "message": message,
+            "tree": tree["sha"],
+            "parents": [parent] if parent else [],
+        })
+        if not new_branch:
+            self._request("PATCH", f"git/refs/heads/{self.branch}", json={"sha": commit["sha"]})
+        else:
+            self._request("POST", "git/refs", json={"ref": f"refs/heads/{self.branch}", "sha": commit["sha"]})
+        return {"commit": commit["sha"], "files": sorted(changed), "unchanged": unchanged}
+
+
+def upload_file_to_github(token, repo, file_path, content, commit_message="Add generated code",
+                          branch=DEFAULT_BRANCH, base_url=DEFAULT_API_URL):
+    """Commit one file through the contents API; the workflow itself uploads with ``GitHubUploader``.
+
+    An unchanged file is skipped (and logged) instead of committed again.
+    """
+    url = f"{base_url.rstrip('/')}/repos/{repo}/contents/{file_path}"
 
     headers = {
         "Authorization": f"Bearer {token}",
         "Accept": "application/vnd.github+json"
     }
+    session = get_session()
 
     # Get current SHA if file exists (for updating)
-    response = requests.get(url, headers=headers)
+    response = session.get(url, headers=headers, params={"ref": branch}, timeout=DEFAULT_TIMEOUT)
     sha = response.json().get("sha") if response.status_code == 200 else None
 
+    # Identical content: nothing to commit
+    if sha and sha == git_blob_sha(content):
+        logger.info("⏭️ GitHub upload of %s to %s@%s skipped: file is unchanged", file_path, repo, branch)
+        return 200, {"sha": sha, "skipped": True, "message": "File is unchanged"}
+
     data = {
         "message": commit_message,
         "content": base64.b64encode(content.encode()).decode("utf-8"),
-        "branch": "main"
+        "branch": branch
     }
 
     if sha:
         data["sha"] = sha
 
-    response = requests.put(url, headers=headers, json=data)
+    response = session.put(url, headers=headers, json=data, timeout=DEFAULT_TIMEOUT)
     return response.status_code, response.json()
@@ -0,0 +1,327 @@
+# github_queue.py (AIFlowCraft - Persistent background queue for GitHub uploads)
+
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from utils.github_helper import DEFAULT_API_URL, DEFAULT_BRANCH, GitHubError, GitHubUploader
+from utils.tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = os.getenv(
+    "AIFLOWCRAFT_GITHUB_QUEUE_PATH",
+    os.path.join(tempfile.gettempdir(), "aiflowcraft_github_queue.sqlite"),
+)
+MAX_ATTEMPTS = 6
+BASE_DELAY = 2.0
+MAX_BACKOFF = 300.0
+# Primary rate limits reset at most an hour later
+MAX_RATE_LIMIT_WAIT = 3600.0
+IDLE_POLL_SECONDS = 60.0
+# Finished jobs are forgotten after a week
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+FINISHED = ("done", "unchanged", "failed")
+
+
+def retry_delay(attempt: int, headers=None, now: float = None) -> float:
+    """Seconds to wait before retry ``attempt`` (1-based).
+
+    A ``Retry-After`` header (seconds or HTTP date) wins, then an exhausted
+    ``X-RateLimit-Remaining`` with its ``X-RateLimit-Reset`` time; otherwise
+    exponential backoff with jitter.
+    """
+    headers = headers or {}
+    now = time.time() if now is None else now
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            wait = float(retry_after)
+        except ValueError:
+            try:
+                wait = parsedate_to_datetime(retry_after).timestamp() - now
+            except (TypeError, ValueError):
+                wait = None
+        if wait is not None:
+            return min(max(wait, 0.0), MAX_RATE_LIMIT_WAIT)
+    if headers.get("X-RateLimit-Remaining") == "0" and headers.get("X-RateLimit-Reset"):
+        try:
+            # One extra second: the reset time is rounded down
+            return min(max(float(headers["X-RateLimit-Reset"]) - now, 0.0) + 1, MAX_RATE_LIMIT_WAIT)
+        except ValueError:
+            pass
+    backoff = min(BASE_DELAY * 2 ** (attempt - 1), MAX_BACKOFF)
+    return backoff * random.uniform(0.5, 1.0)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Network errors, server errors and rate limits are retried; other API errors are final."""
+    if isinstance(error, requests.RequestException):
+        return True
+    if isinstance(error, GitHubError):
+        if error.status == 429 or error.status >= 500:
+            return True
+        # GitHub reports both primary and secondary rate limits as 403
+        return error.status == 403 and (
+            error.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in error.headers
+        )
+    return False
+
+
+def format_job(job: dict, has_token: bool = True) -> str:
+    """One log line describing an upload job."""
+    target = f"`{job['repo']}@{job['branch']}`"
+    status = job["status"]
+    if status == "done":
+        return f"🚀 GitHub upload to {target} committed {job['result']['commit'][:7]} ({len(job['result']['files'])} files)"
+    if status == "unchanged":
+        return f"⏭️ GitHub upload to {target} skipped: all files are unchanged"
+    if status == "failed":
+        attempts = f"{job['attempts']} attempt" + ("s" if job["attempts"] != 1 else "")
+        return f"❌ GitHub upload to {target} failed after {attempts}: {job['error']}"
+    if status == "running":
+        return f"⏳ GitHub upload to {target} in progress"
+    if not has_token:
+        return f"🔑 GitHub upload to {target} is waiting for a token (tokens are not kept across restarts)"
+    if job["attempts"]:
+        wait = max(job["next_attempt"] - time.time(), 0)
+        return (
+            f"🔁 GitHub upload to {target} retry {job['attempts'] + 1}/{MAX_ATTEMPTS} in {wait:.0f}s "
+            f"(last error: {job['error']})"
+        )
+    return f"📤 GitHub upload to {target} queued"
+
+
+class GitHubUploadQueue:
+    """GitHub uploads committed by a background thread, off the workflow's path.
+
+    Jobs live in a SQLite file, so uploads that were queued or retrying when
+    the process stopped resume on the next start. Each job has a caller
+    chosen key (one per workflow run); enqueueing the same key again returns
+    the existing job instead of committing twice, and a retry after a
+    commit that did land finds every file unchanged and makes no new commit.
+    Tokens are held in memory only, per job, and never written to the queue
+    file; a job's token is forgotten once the job has finished, so sessions
+    uploading to the same repository never commit with each other's token.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, start=True):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS upload_jobs ("
+            "key TEXT PRIMARY KEY, base_url TEXT NOT NULL, repo TEXT NOT NULL, branch TEXT NOT NULL, "
+            "message TEXT NOT NULL, files TEXT, companions TEXT, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, error TEXT, result TEXT, "
+            "created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS upload_jobs_due ON upload_jobs(status, next_attempt)")
+        now = time.time()
+        # Jobs an earlier process was committing when it stopped start over
+        self._conn.execute("UPDATE upload_jobs SET status = 'queued' WHERE status = 'running'")
+        self._conn.execute(
+            f"DELETE FROM upload_jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND updated < ?",
+            (*FINISHED, now - JOB_RETENTION_SECONDS),
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._listeners = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        if start:
+            self.start()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="github-upload-queue", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def enqueue(self, key: str, token: str, repo: str, files: dict, message: str, companions: dict = None,
+                branch: str = DEFAULT_BRANCH, base_url: str = DEFAULT_API_URL, on_status=None) -> dict:
+        """Queue a commit of ``files`` and return the job.
+
+        ``on_status(job)`` is called from the worker thread whenever the job
+        is retried or finishes.
+        """
+        now = time.time()
+        with self._lock:
+            self._tokens[key] = token
+            if on_status is not None:
+                self._listeners[key] = on_status
+            self._conn.execute(
+                "INSERT OR IGNORE INTO upload_jobs (key, base_url, repo, branch, message, files, companions, "
+                "status, next_attempt, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (key, base_url, repo, branch, message, json.dumps(files), json.dumps(companions or {}), now, now, now),
+            )
+            self._conn.commit()
+        self._wake.set()
+        return self.job(key)
+
+    def retry(self, key: str, token: str = None):
+        """Queue a failed job (or one waiting for a token) again."""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM upload_jobs WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return
+            if token:
+                self._tokens[key] = token
+            self._conn.execute(
+                "UPDATE upload_jobs SET status = 'queued', attempts = 0, next_attempt = ?, updated = ? "
+                "WHERE key = ? AND status IN ('failed', 'queued')",
+                (time.time(), time.time(), key),
+            )
+            self._conn.commit()
+        self._wake.set()
+
+    def has_token(self, job: dict) -> bool:
+        return job["key"] in self._tokens
+
+    def job(self, key: str):
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM upload_jobs WHERE key = ?", (key,))
+            row = cursor.fetchone()
+            return self._as_job(cursor, row) if row else None
+
+    def status_line(self, key: str):
+        job = self.job(key)
+        return format_job(job, self.has_token(job)) if job else None
+
+    def wait(self, key: str, timeout: float = None) -> dict:
+        """Block until a job has finished (or ``timeout`` passed) and return it."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            job = self.job(key)
+            if job is None or job["status"] in FINISHED:
+                return job
+            if deadline is not None and time.time() >= deadline:
+                return job
+            time.sleep(0.05)
+
+    @staticmethod
+    def _as_job(cursor, row) -> dict:
+        job = dict(zip([d[0] for d in cursor.description], row))
+        for name in ("files", "companions", "result"):
+            job[name] = json.loads(job[name]) if job[name] else None
+        return job
+
+    def _claim(self):
+        """Mark the next due job that has a token as running and return it."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT * FROM upload_jobs WHERE status = 'queued' AND next_attempt <= ? ORDER BY next_attempt",
+                (time.time(),),
+            )
+            for row in cursor.fetchall():
+                job = self._as_job(cursor, row)
+                if self.has_token(job):
+                    self._conn.execute(
+                        "UPDATE upload_jobs SET status = 'running', updated = ? WHERE key = ?", (time.time(), job["key"])
+                    )
+                    self._conn.commit()
+                    job["status"] = "running"
+                    return job
+            return None
+
+    def _idle_seconds(self) -> float:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT min(next_attempt) FROM upload_jobs WHERE status = 'queued'"
+            ).fetchone()
+        if row[0] is None:
+            return IDLE_POLL_SECONDS
+        return min(max(row[0] - time.time(), 0.05), IDLE_POLL_SECONDS)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            job = self._claim()
+            if job is None:
+                self._wake.wait(self._idle_seconds())
+                continue
+            try:
+                self._process(job)
+            except Exception:
+                logger.exception("GitHub upload job %s crashed", job["key"])
+                self._update(job["key"], status="failed", attempts=job["attempts"] + 1, error="internal error")
+
+    def _process(self, job):
+        token = self._tokens[job["key"]]
+        uploader = GitHubUploader(token, job["repo"], branch=job["branch"], base_url=job["base_url"])
+        attempts = job["attempts"] + 1
+        # The job key is the workflow run id, so the upload joins the run's trace
+        with span("github.upload", trace_id=job["key"], repo=job["repo"], branch=job["branch"],
+                  attempt=attempts, retries=attempts - 1) as current:
+            try:
+                result = uploader.commit_files(job["files"], job["message"], job["companions"])
+            except Exception as e:
+                error = e.message if isinstance(e, GitHubError) else str(e)
+                current.status, current.error = "error", error
+                if is_retryable(e) and attempts < MAX_ATTEMPTS:
+                    delay = retry_delay(attempts, getattr(e, "headers", None))
+                    logger.info("GitHub upload %s attempt %d failed, retrying in %.1fs: %s", job["key"], attempts, delay, error)
+                    self._update(job["key"], status="queued", attempts=attempts, error=error,
+                                 next_attempt=time.time() + delay)
+                else:
+                    self._update(job["key"], status="failed", attempts=attempts, error=error)
+                return
+            current.set(committed=len(result["files"]), unchanged=len(result["unchanged"]))
+        status = "done" if result["commit"] else "unchanged"
+        self._update(job["key"], status=status, attempts=attempts, error=None, result=json.dumps(result))
+
+    def _update(self, key, **fields):
+        fields["updated"] = time.time()
+        if fields["status"] in ("done", "unchanged"):
+            # The contents are only needed until the job has committed; a failed job may be retried
+            fields.update(files=None, companions=None)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE upload_jobs SET {assignments} WHERE key = ?", (*fields.values(), key))
+            self._conn.commit()
+            listener = self._listeners.get(key)
+            if fields["status"] in FINISHED:
+                self._listeners.pop(key, None)
+                # A retry brings its own token
+                self._tokens.pop(key, None)
+        if listener is not None:
+            job = self.job(key)
+            try:
+                listener(job)
+            except Exception:
+                logger.exception("GitHub upload status callback failed for %s", key)
+
+
+_default_queue = None
+_default_lock = threading.Lock()
+
+
+def get_upload_queue() -> GitHubUploadQueue:
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            _default_queue = GitHubUploadQueue()
+        return _default_queue
+
+
+def set_default_queue(queue: GitHubUploadQueue):
+    global _default_queue
+    with _default_lock:
+        _default_queue = queue
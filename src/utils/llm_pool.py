@@ -0,0 +1,135 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+import httpx
+from langchain_groq import ChatGroq
+
+from utils.tracing import add_to_span
+
+
+DEFAULT_POOL_SIZE = int(os.getenv("AIFLOWCRAFT_LLM_POOL_SIZE", "20"))
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("AIFLOWCRAFT_LLM_IDLE_TIMEOUT", "60"))
+
+
+def _count_request(request):
+    add_to_span("http_requests")
+
+
+async def _acount_request(request):
+    add_to_span("http_requests")
+
+
+class LLMClientPool:
+    """Registry of ``ChatGroq`` clients keyed by (api_key, model, temperature).
+
+    Every client shares one keep-alive HTTP connection pool, so repeated
+    agent and review calls reuse open TLS connections instead of building a
+    new client and connection per call. An ``httpx.AsyncClient`` is bound to
+    the event loop it first runs on, so async callers get one per running
+    loop; it is dropped with its loop. Clients unused for longer than
+    ``idle_timeout`` are dropped from the registry; the same timeout closes
+    idle keep-alive connections.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=idle_timeout,
+        )
+        # Requests are counted on the caller's tracing span, which turns client retries into a count
+        self.http_client = httpx.Client(limits=self._limits, event_hooks={"request": [_count_request]})
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._clients = {}
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    def _async_client(self):
+        """The ``AsyncClient`` of the running event loop, or ``None`` outside one."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(limits=self._limits, event_hooks={"request": [_acount_request]})
+            self._async_clients[loop] = client
+        return client
+
+    def get(self, api_key, model, temperature=None) -> ChatGroq:
+        now = time.monotonic()
+        with self._lock:
+            async_client = self._async_client()
+            key = (api_key, model, temperature, id(async_client) if async_client else None)
+            self._evict_idle(now)
+            llm = self._clients.get(key)
+            if llm is None:
+                extra = {} if temperature is None else {"temperature": temperature}
+                if async_client is not None:
+                    extra["http_async_client"] = async_client
+                llm = ChatGroq(
+                    api_key=api_key,
+                    model_name=model,
+                    http_client=self.http_client,
+                    **extra
+                )
+                self._clients[key] = llm
+            self._last_used[key] = now
+            return llm
+
+    def _evict_idle(self, now):
+        for loop in [loop for loop in self._async_clients if loop.is_closed()]:
+            del self._async_clients[loop]
+        live = {id(client) for client in self._async_clients.values()}
+        for key, last_used in list(self._last_used.items()):
+            # Clients whose event loop is gone cannot be used again
+            if now - last_used > self.idle_timeout or (key[3] is not None and key[3] not in live):
+                self._clients.pop(key, None)
+                self._last_used.pop(key, None)
+
+    def __len__(self):
+        return len(self._clients)
+
+    def close(self):
+        with self._lock:
+            self._clients.clear()
+            self._last_used.clear()
+            async_clients = list(self._async_clients.items())
+            self._async_clients.clear()
+        self.http_client.close()
+        for loop, client in async_clients:
+            # An AsyncClient can only be closed on its own loop; a closed loop took its connections with it
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            else:
+                loop.run_until_complete(client.aclose())
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def get_pool() -> LLMClientPool:
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = LLMClientPool()
+        return _default_pool
+
+
+def set_default_pool(pool: LLMClientPool):
+    """Make ``pool`` the process-wide pool (e.g. one created by ``st.cache_resource``)."""
+    global _default_pool
+    with _default_lock:
+        _default_pool = pool
+
+
+def get_llm(api_key, model, temperature=None) -> ChatGroq:
+    return get_pool().get(api_key, model, temperature)
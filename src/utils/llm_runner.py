@@ -0,0 +1,141 @@
+# llm_runner.py (AIFlowCraft - Single entry point for prompt -> LLM calls)
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from utils.llm_cache import get_cache, make_cache_key
+from utils.llm_pool import get_llm
+from utils.prompt_compaction import DEFAULT_MIN_BLOCK_CHARS
+from utils.prompts import get_prompt
+from utils.token_budget import count_tokens, fit_inputs, prompt_budget
+from utils.tracing import span
+
+
+_call_log = ContextVar("llm_call_log", default=None)
+
+
+@contextmanager
+def collect_llm_calls():
+    """Collect a record for every ``run_prompt`` call made inside the block.
+
+    Each record is a dict with ``prompt_id``, ``stage``, ``model``,
+    ``cache`` ("hit", "miss" or "bypass"), the ``cache_key`` used, the
+    estimated ``prompt_tokens`` and ``completion_tokens``, the prompt
+    ``budget``, the input slots ``trimmed`` to fit it and the characters
+    ``compacted`` away by writing repeated blocks once.
+    """
+    calls = []
+    token = _call_log.set(calls)
+    try:
+        yield calls
+    finally:
+        _call_log.reset(token)
+
+
+def _record(**info):
+    calls = _call_log.get()
+    if calls is not None:
+        calls.append(info)
+
+
+def _use_cache(settings, stage) -> bool:
+    settings = settings or {}
+    if not settings.get("llm_cache_enabled", True):
+        return False
+    return not settings.get("cache_bypass", {}).get(stage)
+
+
+def _compaction_min_chars(settings):
+    settings = settings or {}
+    if not settings.get("prompt_compaction", True):
+        return None
+    return settings.get("compaction_min_chars", DEFAULT_MIN_BLOCK_CHARS)
+
+
+def _prepare(prompt_id, inputs, model, temperature, settings, stage):
+    spec = get_prompt(prompt_id)
+    min_chars = _compaction_min_chars(settings)
+    inputs, budget_report = fit_inputs(spec.text, inputs, prompt_budget(model, settings), min_chars)
+    if min_chars is None:
+        prompt_text, budget_report["compacted"] = spec.render(inputs), 0
+    else:
+        prompt_text, budget_report["compacted"] = spec.render_compact(inputs, min_chars)
+    key = None
+    if _use_cache(settings, stage or prompt_id):
+        key = make_cache_key(model, spec.prompt_id, spec.prompt_hash, prompt_text, temperature)
+    return spec, prompt_text, key, budget_report
+
+
+def _finish(current, prompt_id, stage, model, cache, key, budget_report, response):
+    completion_tokens = count_tokens(response)
+    current.set(cache=cache)
+    current.add("llm_calls")
+    current.add("prompt_tokens", budget_report["prompt_tokens"])
+    current.add("completion_tokens", completion_tokens)
+    if cache != "bypass":
+        current.add("cache_hits" if cache == "hit" else "cache_misses")
+    # Every HTTP request after the first one was a retry by the client
+    retries = current.counters.get("http_requests", 0) - 1
+    if retries > 0:
+        current.add("retries", retries)
+    _record(
+        prompt_id=prompt_id, stage=stage, model=model, cache=cache, cache_key=key,
+        prompt_tokens=budget_report["prompt_tokens"], completion_tokens=completion_tokens,
+        budget=budget_report["budget"], trimmed=budget_report["trimmed"],
+        compacted=budget_report["compacted"]
+    )
+    return response
+
+
+def _stream(llm, prompt_text, current) -> str:
+    """Call the model, streaming so the time to the first token can be measured."""
+    parts = []
+    for chunk in llm.stream(prompt_text):
+        if chunk.content:
+            current.mark_first_token()
+            parts.append(chunk.content)
+    return "".join(parts)
+
+
+async def _astream(llm, prompt_text, current) -> str:
+    parts = []
+    async for chunk in llm.astream(prompt_text):
+        if chunk.content:
+            current.mark_first_token()
+            parts.append(chunk.content)
+    return "".join(parts)
+
+
+def run_prompt(prompt_id, inputs: dict, api_key, model, temperature=None, settings: dict = None, stage: str = None) -> str:
+    """Render a registered prompt, call the model and return the response text.
+
+    Inputs are trimmed to the model's prompt budget first (see
+    ``utils/token_budget.py``). Responses are served from the shared response
+    cache unless caching is disabled or bypassed for ``stage`` in ``settings``.
+    Each call runs in an ``llm`` tracing span (``utils/tracing.py``).
+    """
+    with span("llm", prompt_id=prompt_id, stage=stage, model=model) as current:
+        spec, prompt_text, key, budget_report = _prepare(prompt_id, inputs, model, temperature, settings, stage)
+        if key is not None:
+            cached = get_cache().get(key)
+            if cached is not None:
+                return _finish(current, prompt_id, stage, model, "hit", key, budget_report, cached)
+
+        response = _stream(get_llm(api_key, model, temperature), prompt_text, current)
+        if key is not None:
+            get_cache().put(key, response)
+        return _finish(current, prompt_id, stage, model, "miss" if key else "bypass", key, budget_report, response)
+
+
+async def arun_prompt(prompt_id, inputs: dict, api_key, model, temperature=None, settings: dict = None, stage: str = None) -> str:
+    with span("llm", prompt_id=prompt_id, stage=stage, model=model) as current:
+        spec, prompt_text, key, budget_report = _prepare(prompt_id, inputs, model, temperature, settings, stage)
+        if key is not None:
+            cached = get_cache().get(key)
+            if cached is not None:
+                return _finish(current, prompt_id, stage, model, "hit", key, budget_report, cached)
+
+        response = await _astream(get_llm(api_key, model, temperature), prompt_text, current)
+        if key is not None:
+            get_cache().put(key, response)
+        return _finish(current, prompt_id, stage, model, "miss" if key else "bypass", key, budget_report, response)
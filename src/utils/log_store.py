@@ -0,0 +1,213 @@
+# log_store.py (AIFlowCraft - Bounded, structured workflow log)
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+
+
+DEFAULT_LOG_PATH = os.getenv(
+    "AIFLOWCRAFT_LOG_PATH",
+    os.path.join(tempfile.gettempdir(), "aiflowcraft_logs.sqlite"),
+)
+DEFAULT_CAPACITY = 500
+# Records moved to the spill file at a time once the buffer is full
+SPILL_BATCH = 100
+LOG_RETENTION_SECONDS = 7 * 24 * 3600
+
+LEVELS = ("info", "success", "warning", "error")
+# Leading emoji -> level, for messages logged without an explicit level
+LEVEL_MARKERS = {
+    "❌": "error",
+    "⚠️": "warning",
+    "✅": "success",
+    "🚀": "success",
+    "🎯": "success",
+}
+# Entries containing one of these are shown as the workflow's latest status
+STATUS_MARKERS = ("▶️", "⏸️", "✅", "❌")
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def _connection(path):
+    """One shared connection per spill file; old records of every session are dropped on open."""
+    with _connections_lock:
+        conn = _connections.get(path)
+        if conn is None:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS log_records ("
+                "log_id TEXT NOT NULL, seq INTEGER NOT NULL, time REAL NOT NULL, level TEXT NOT NULL, "
+                "stage TEXT, message TEXT NOT NULL, PRIMARY KEY (log_id, seq)) WITHOUT ROWID"
+            )
+            conn.execute("DELETE FROM log_records WHERE time < ?", (time.time() - LOG_RETENTION_SECONDS,))
+            conn.commit()
+            _connections[path] = conn
+        return conn
+
+
+def infer_level(message: str) -> str:
+    for marker, level in LEVEL_MARKERS.items():
+        if message.startswith(marker):
+            return level
+    return "info"
+
+
+class WorkflowLog:
+    """The log of one workflow run, kept as structured records.
+
+    The newest ``capacity`` records stay in memory; older ones are moved in
+    batches to a SQLite file shared by all sessions, so memory use and the
+    cost of showing the log do not grow with the length of the run.
+    ``query`` pages through the whole history newest first, filtered by
+    level, stage and text. ``append``, ``len``, indexing and iteration
+    (over message strings) work like the plain list this replaces.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, path=DEFAULT_LOG_PATH):
+        self.capacity = max(capacity, SPILL_BATCH)
+        self.path = path
+        self.log_id = uuid.uuid4().hex
+        self._buffer = deque()
+        self._spilled = 0
+        self._latest_status = None
+        self._lock = threading.RLock()
+
+    def append(self, message: str, stage: str = None, level: str = None) -> dict:
+        record = {
+            "seq": None,
+            "time": time.time(),
+            "level": level or infer_level(message),
+            "stage": stage,
+            "message": message,
+        }
+        with self._lock:
+            record["seq"] = self._spilled + len(self._buffer)
+            self._buffer.append(record)
+            if any(marker in message for marker in STATUS_MARKERS):
+                self._latest_status = record
+            if self.path and len(self._buffer) > self.capacity:
+                self._spill()
+            elif len(self._buffer) > self.capacity:
+                # Without a spill file the oldest records are dropped
+                self._buffer.popleft()
+                self._spilled += 1
+        return record
+
+    def _spill(self):
+        batch = [self._buffer.popleft() for _ in range(min(SPILL_BATCH, len(self._buffer)))]
+        conn = _connection(self.path)
+        conn.executemany(
+            "INSERT OR REPLACE INTO log_records (log_id, seq, time, level, stage, message) VALUES (?, ?, ?, ?, ?, ?)",
+            [(self.log_id, r["seq"], r["time"], r["level"], r["stage"], r["message"]) for r in batch],
+        )
+        conn.commit()
+        self._spilled += len(batch)
+
+    def latest_status(self):
+        """The newest progress, approval or failure entry (or the newest entry), or ``None``."""
+        with self._lock:
+            if self._latest_status is not None:
+                return self._latest_status
+            return self._buffer[-1] if self._buffer else None
+
+    def stages(self) -> list:
+        """Stages that have entries, in order of first appearance."""
+        with self._lock:
+            found = dict.fromkeys(r["stage"] for r in self._buffer if r["stage"])
+            if self._spilled and self.path:
+                rows = _connection(self.path).execute(
+                    "SELECT stage FROM log_records WHERE log_id = ? AND stage IS NOT NULL GROUP BY stage ORDER BY min(seq)",
+                    (self.log_id,),
+                ).fetchall()
+                found = dict.fromkeys([row[0] for row in rows] + list(found))
+        return list(found)
+
+    @staticmethod
+    def _matches(record, levels, stage, text) -> bool:
+        return (
+            (not levels or record["level"] in levels)
+            and (stage is None or record["stage"] == stage)
+            and (not text or text.lower() in record["message"].lower())
+        )
+
+    def query(self, levels=None, stage=None, text=None, offset: int = 0, limit: int = 50) -> tuple:
+        """``(records, total)``: one page of matching records, newest first, and how many match in all."""
+        with self._lock:
+            recent = [r for r in reversed(self._buffer) if self._matches(r, levels, stage, text)]
+            records = recent[offset:offset + limit]
+            total = len(recent)
+            if not (self._spilled and self.path):
+                return records, total
+
+            where, params = ["log_id = ?"], [self.log_id]
+            if levels:
+                where.append(f"level IN ({', '.join('?' * len(levels))})")
+                params += list(levels)
+            if stage is not None:
+                where.append("stage = ?")
+                params.append(stage)
+            if text:
+                where.append("instr(lower(message), ?) > 0")
+                params.append(text.lower())
+            conn = _connection(self.path)
+            clause = " AND ".join(where)
+            total += conn.execute(f"SELECT count(*) FROM log_records WHERE {clause}", params).fetchone()[0]
+            if len(records) < limit:
+                rows = conn.execute(
+                    f"SELECT seq, time, level, stage, message FROM log_records WHERE {clause} "
+                    "ORDER BY seq DESC LIMIT ? OFFSET ?",
+                    params + [limit - len(records), max(offset - len(recent), 0)],
+                ).fetchall()
+                records += [dict(zip(("seq", "time", "level", "stage", "message"), row)) for row in rows]
+            return records, total
+
+    def clear(self):
+        with self._lock:
+            if self._spilled and self.path:
+                conn = _connection(self.path)
+                conn.execute("DELETE FROM log_records WHERE log_id = ?", (self.log_id,))
+                conn.commit()
+            self._buffer.clear()
+            self._spilled = 0
+            self._latest_status = None
+
+    def __len__(self):
+        with self._lock:
+            return self._spilled + len(self._buffer)
+
+    def __iter__(self):
+        """Every message, oldest first."""
+        with self._lock:
+            spilled = []
+            if self._spilled and self.path:
+                spilled = [
+                    row[0] for row in _connection(self.path).execute(
+                        "SELECT message FROM log_records WHERE log_id = ? ORDER BY seq", (self.log_id,)
+                    )
+                ]
+            recent = [r["message"] for r in self._buffer]
+        return iter(spilled + recent)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        with self._lock:
+            size = self._spilled + len(self._buffer)
+            if index < 0:
+                index += size
+            if not 0 <= index < size:
+                raise IndexError("log index out of range")
+            if index >= self._spilled:
+                return self._buffer[index - self._spilled]["message"]
+            if not self.path:
+                raise IndexError("log entry was dropped")
+            row = _connection(self.path).execute(
+                "SELECT message FROM log_records WHERE log_id = ? AND seq = ?", (self.log_id, index)
+            ).fetchone()
+            return row[0]
@@ -0,0 +1,77 @@
+# prompt_compaction.py (AIFlowCraft - Removes repeated large blocks from rendered prompts)
+
+import re
+import string
+
+
+# Values / paragraphs shorter than this are cheap enough to repeat
+DEFAULT_MIN_BLOCK_CHARS = 200
+
+_PARAGRAPH_SPLIT = re.compile(r"(\n[ \t]*\n)")
+
+
+def section_label(name: str) -> str:
+    return name.replace("_", " ")
+
+
+def render_compacted(template_text: str, inputs: dict, min_chars: int = DEFAULT_MIN_BLOCK_CHARS):
+    """Fill ``template_text`` like ``str.format``, writing each large value only once.
+
+    A value of at least ``min_chars`` characters that was already written
+    (by the same variable or by another one) is replaced with a short
+    reference to the section it first appeared in. Returns
+    ``(text, saved_chars)``.
+    """
+    parts = []
+    written = {}
+    saved = 0
+    for literal, field, format_spec, conversion in string.Formatter().parse(template_text):
+        parts.append(literal)
+        if field is None:
+            continue
+        value = inputs[field]
+        if conversion:
+            value = string.Formatter().convert_field(value, conversion)
+        value = format(value, format_spec or "")
+        if len(value) >= min_chars and value in written:
+            reference = f"[Same as the {section_label(written[value])} above]"
+            saved += len(value) - len(reference)
+            value = reference
+        elif len(value) >= min_chars:
+            written[value] = field
+        parts.append(value)
+    return "".join(parts), saved
+
+
+def dedupe_blocks(text: str, min_chars: int = DEFAULT_MIN_BLOCK_CHARS):
+    """Replace repeats of any paragraph of at least ``min_chars`` characters.
+
+    Catches duplication that is not tied to one variable, e.g. the same
+    excerpt appearing in both the document content and the reference data.
+    Returns ``(text, saved_chars)``.
+    """
+    parts = _PARAGRAPH_SPLIT.split(text)
+    seen = set()
+    saved = 0
+    # Even indexes are paragraphs, odd indexes the blank-line separators
+    for i in range(0, len(parts), 2):
+        block = parts[i].strip()
+        if len(block) < min_chars:
+            continue
+        if block in seen:
+            reference = "[Repeated block omitted; see above]"
+            saved += len(parts[i]) - len(reference)
+            parts[i] = reference
+        else:
+            seen.add(block)
+    return "".join(parts), saved
+
+
+def compact_prompt(template_text: str, inputs: dict, min_chars: int = DEFAULT_MIN_BLOCK_CHARS):
+    """Render ``template_text`` with repeated large blocks written once.
+
+    Returns ``(text, saved_chars)``.
+    """
+    text, saved_values = render_compacted(template_text, inputs, min_chars)
+    text, saved_blocks = dedupe_blocks(text, min_chars)
+    return text, saved_values + saved_blocks
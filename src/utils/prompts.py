@@ -0,0 +1,468 @@
+# prompts.py (AIFlowCraft - Versioned, precompiled prompt registry)
+
+import hashlib
+import threading
+
+from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
+
+from utils.prompt_compaction import DEFAULT_MIN_BLOCK_CHARS, compact_prompt
+
+
+PROMPT_KINDS = {
+    "text": PromptTemplate,
+    "chat": ChatPromptTemplate,
+}
+
+
+class PromptSpec:
+    """One compiled version of a prompt.
+
+    ``template`` is parsed once when the spec is created; ``prompt_hash`` is a
+    stable fingerprint of the template text that caches and token accounting
+    can use alongside ``prompt_id`` and ``version``.
+    """
+
+    def __init__(self, prompt_id: str, text: str, version: int, kind: str = "text"):
+        if kind not in PROMPT_KINDS:
+            raise ValueError(f"Unknown prompt kind: {kind}")
+        self.prompt_id = prompt_id
+        self.text = text
+        self.version = version
+        self.kind = kind
+        self.template = PROMPT_KINDS[kind].from_template(text)
+        self.variables = tuple(sorted(self.template.input_variables))
+        self.prompt_hash = hashlib.sha256(f"{kind}\0{text}".encode("utf-8")).hexdigest()[:16]
+
+    def render(self, inputs: dict) -> str:
+        """Fill the template with ``inputs`` and return the prompt text sent to the model."""
+        if self.kind == "chat":
+            return "\n\n".join(message.content for message in self.template.format_messages(**inputs))
+        return self.template.format(**inputs)
+
+    def render_compact(self, inputs: dict, min_chars: int = DEFAULT_MIN_BLOCK_CHARS):
+        """Like ``render`` but with repeated large blocks written once; returns ``(text, saved_chars)``."""
+        # Both kinds are built with from_template, i.e. a single message holding ``text``
+        return compact_prompt(self.text, inputs, min_chars)
+
+    def __repr__(self):
+        return f"PromptSpec({self.prompt_id!r}, version={self.version}, hash={self.prompt_hash})"
+
+
+class PromptRegistry:
+    """Prompt ID -> current ``PromptSpec``, with every registered version kept.
+
+    Re-registering an ID hot-swaps the prompt: the new text is compiled once
+    and served to all later calls, without re-parsing on each call.
+    """
+
+    def __init__(self):
+        self._current = {}
+        self._history = {}
+        self._lock = threading.Lock()
+
+    def register(self, prompt_id: str, text: str, kind: str = "text", version: int = None) -> PromptSpec:
+        with self._lock:
+            history = self._history.setdefault(prompt_id, {})
+            current = self._current.get(prompt_id)
+            if current is not None and current.text == text and current.kind == kind and version in (None, current.version):
+                return current
+            if version is None:
+                version = max(history, default=0) + 1
+            spec = PromptSpec(prompt_id, text, version, kind)
+            history[version] = spec
+            self._current[prompt_id] = spec
+            return spec
+
+    def get(self, prompt_id: str, version: int = None) -> PromptSpec:
+        if version is None:
+            return self._current[prompt_id]
+        return self._history[prompt_id][version]
+
+
+registry = PromptRegistry()
+
+
+def get_prompt(prompt_id: str, version: int = None) -> PromptSpec:
+    return registry.get(prompt_id, version)
+
+
+def register_prompt(prompt_id: str, text: str, kind: str = "text", version: int = None) -> PromptSpec:
+    return registry.register(prompt_id, text, kind, version)
+
+
+# === Built-in prompts ===
+
+# Version 1: the original prompts, kept so cached responses and logs stay explainable
+
+USER_STORIES_PROMPT_V1 = """
+You are a Product Analyst AI.
+
+{feedback_text}
+
+Generate clear user stories based on the following context.
+
+User Input:
+{user_input}
+
+Document Content:
+{file_content}
+
+Use the connected database reference below to guide your decisions (if applicable).
+{reference_text}
+
+Feedback for Improvement:
+{feedback_text}
+
+If feedback is provided, you MUST revise your user stories accordingly.
+
+Write each user story in this format:
+- US1: As a [type of user], I want to [goal] so that [benefit].
+
+Always end your response with the following plain text (no markdown):
+Decision: APPROVED or REJECTED  
+Reason: [your reasoning here]
+"""
+
+DESIGN_PROMPT_V1 = """
+You are a Design Assistant AI.
+
+Mention the feedback text in your response like this:
+{feedback_text}
+
+Generate a detailed design document based on the following context:
+
+User Input:
+{user_input}
+
+Document Content:
+{file_content}
+
+Use the following database reference information to guide your response:
+{reference_text}
+
+Feedback for Improvement:
+{feedback_text}
+
+If feedback is provided, you MUST revise your design document accordingly.
+
+The design should be structured, logical, and cover necessary system components.
+Always end your response with the following plain text (no markdown):
+Decision: APPROVED or REJECTED  
+Reason: [your reasoning here]
+"""
+
+CODE_PROMPT_V1 = """
+You are a Code Generation AI.
+
+{feedback_text}
+
+Based on the following inputs, generate clean and functional code snippets:
+
+Use python as the predominant language. If the user input requires us to use SQL please use it.
+
+User Input:
+{user_input}
+
+Design Document:
+{design_doc}
+
+Document Content:
+{file_content}
+
+Use the connected database reference below to guide your decisions (if applicable).
+{reference_text}
+
+Feedback for Improvement:
+{feedback_text}
+If feedback is provided, you MUST revise your code accordingly and mention it in your output.
+Always end your response with the following plain text (no markdown):
+Decision: APPROVED or REJECTED  
+Reason: [your reasoning here]
+"""
+
+REVIEW_PROMPT_V1 = """
+You are a Senior Code Reviewer AI.
+
+{feedback_text}
+
+Review the following code and provide structured feedback.
+
+code:
+{code}
+
+Use the connected database reference below to guide your decisions (if applicable).
+{reference_text}
+
+Reviewer Feedback (if any):
+{feedback_text}
+
+If feedback is provided, you MUST revise your review feedback accordingly.
+
+write test cases based on the {code} so that its clear on the UAT as well.
+
+Please analyze:
+- Code quality (structure, readability, performance)
+- Best practice adherence
+- Maintainability
+- Test coverage
+- Alignment with user needs
+
+Provide a structured review.
+
+write test cases based on the {code} so that its clear on the UAT as well.
+
+Always end your response with the following plain text (no markdown):
+
+Decision: APPROVED or REJECTED  
+Reason: [your reasoning here]
+"""
+
+QA_PROMPT_V1 = """
+You are a QA Engineer AI responsible for validating the code implementation against the design and user stories.
+
+{feedback_text}
+
+User Stories:
+{user_stories}
+
+Design Document:
+{design_doc}
+
+Code Snippet:
+{code_snippet}
+
+Use the connected database reference below to guide your decisions (if applicable).
+{reference_text}
+
+QA Feedback (if any):
+{feedback_text}
+
+If feedback is provided, you MUST revise your QA assessment accordingly.
+
+Please perform the following:
+- Functional correctness
+- Coverage of edge cases
+- Validation logic
+- Adherence to requirements
+- Potential issues or bugs
+
+Generate a QA assessment including observations and a final recommendation.
+
+Be a bit more lenient with the assessment.
+
+Always end your response with the following plain text (no markdown):
+Decision: APPROVED or REJECTED  
+Reason: [your reasoning here]
+"""
+
+LLM_REVIEW_PROMPT_V1 = """
+        You are an expert reviewer for an AI workflow system.
+
+        Your job is to review the output generated for the stage: {stage_name}.
+
+        ---
+        🧾 User Input:
+        {user_input}
+
+        💡 Feedback (if any):
+        {feedback}
+
+        📤 Stage Output to Review:
+        {stage_output}
+        ---
+
+        Evaluate the output based on the user input and feedback.
+        Decide whether it should be APPROVED or REJECTED.
+
+        Respond in the following format (plain text, no markdown or bullet points):
+        Decision: APPROVED or REJECTED
+        Reason: <short reason>
+        """
+
+register_prompt("userstories", USER_STORIES_PROMPT_V1, version=1)
+register_prompt("design", DESIGN_PROMPT_V1, version=1)
+register_prompt("code", CODE_PROMPT_V1, version=1)
+register_prompt("review", REVIEW_PROMPT_V1, version=1)
+register_prompt("qa", QA_PROMPT_V1, version=1)
+register_prompt("llm_review", LLM_REVIEW_PROMPT_V1, kind="chat", version=1)
+
+# Version 2: the same instructions restructured so that everything static comes
+# first (a stable prefix the provider can cache) and every input variable is
+# written exactly once, in labelled sections at the end.
+
+USER_STORIES_PROMPT = """
+You are a Product Analyst AI.
+
+Generate clear user stories based on the context sections below.
+Use the database reference data (if any) to guide your decisions.
+If feedback is provided, you MUST revise your user stories accordingly.
+
+Write each user story in this format:
+- US1: As a [type of user], I want to [goal] so that [benefit].
+
+Always end your response with the following plain text (no markdown):
+Decision: APPROVED or REJECTED  
+Reason: [your reasoning here]
+
+### User Input:
+{user_input}
+
+### Document Content:
+{file_content}
+
+### Database Reference:
+{reference_text}
+
+### Feedback for Improvement:
+{feedback_text}
+"""
+
+DESIGN_PROMPT = """
+You are a Design Assistant AI.
+
+Generate a detailed design document based on the context sections below.
+Use the database reference data (if any) to guide your response.
+If feedback is provided, you MUST revise your design document accordingly and mention the feedback in your response.
+
+The design should be structured, logical, and cover necessary system components.
+Always end your response with the following plain text (no markdown):
+Decision: APPROVED or REJECTED  
+Reason: [your reasoning here]
+
+### User Input:
+{user_input}
+
+### Document Content:
+{file_content}
+
+### Database Reference:
+{reference_text}
+
+### Feedback for Improvement:
+{feedback_text}
+"""
+
+CODE_PROMPT = """
+You are a Code Generation AI.
+
+Based on the context sections below, generate clean and functional code snippets.
+Use python as the predominant language. If the user input requires us to use SQL please use it.
+Use the database reference data (if any) to guide your decisions.
+If feedback is provided, you MUST revise your code accordingly and mention it in your output.
+
+Always end your response with the following plain text (no markdown):
+Decision: APPROVED or REJECTED  
+Reason: [your reasoning here]
+
+### User Input:
+{user_input}
+
+### Design Document:
+{design_doc}
+
+### Document Content:
+{file_content}
+
+### Database Reference:
+{reference_text}
+
+### Feedback for Improvement:
+{feedback_text}
+"""
+
+REVIEW_PROMPT = """
+You are a Senior Code Reviewer AI.
+
+Review the code in the "Code" section below and provide structured feedback.
+Use the database reference data (if any) to guide your decisions.
+If reviewer feedback is provided, you MUST revise your review feedback accordingly.
+
+Please analyze:
+- Code quality (structure, readability, performance)
+- Best practice adherence
+- Maintainability
+- Test coverage
+- Alignment with user needs
+
+Provide a structured review, then write test cases based on the code so that its clear on the UAT as well.
+
+Always end your response with the following plain text (no markdown):
+
+Decision: APPROVED or REJECTED  
+Reason: [your reasoning here]
+
+### Code:
+{code}
+
+### Database Reference:
+{reference_text}
+
+### Reviewer Feedback (if any):
+{feedback_text}
+"""
+
+QA_PROMPT = """
+You are a QA Engineer AI responsible for validating the code implementation against the design and user stories.
+
+Please perform the following:
+- Functional correctness
+- Coverage of edge cases
+- Validation logic
+- Adherence to requirements
+- Potential issues or bugs
+
+Generate a QA assessment including observations and a final recommendation.
+Use the database reference data (if any) to guide your decisions.
+If QA feedback is provided, you MUST revise your QA assessment accordingly.
+
+Be a bit more lenient with the assessment.
+
+Always end your response with the following plain text (no markdown):
+Decision: APPROVED or REJECTED  
+Reason: [your reasoning here]
+
+### User Stories:
+{user_stories}
+
+### Design Document:
+{design_doc}
+
+### Code Snippet:
+{code_snippet}
+
+### Database Reference:
+{reference_text}
+
+### QA Feedback (if any):
+{feedback_text}
+"""
+
+LLM_REVIEW_PROMPT = """
+You are an expert reviewer for an AI workflow system.
+
+Evaluate the stage output below based on the user input and feedback.
+Decide whether it should be APPROVED or REJECTED.
+
+Respond in the following format (plain text, no markdown or bullet points):
+Decision: APPROVED or REJECTED
+Reason: <short reason>
+
+---
+Stage: {stage_name}
+
+🧾 User Input:
+{user_input}
+
+💡 Feedback (if any):
+{feedback}
+
+📤 Stage Output to Review:
+{stage_output}
+"""
+
+register_prompt("userstories", USER_STORIES_PROMPT, version=2)
+register_prompt("design", DESIGN_PROMPT, version=2)
+register_prompt("code", CODE_PROMPT, version=2)
+register_prompt("review", REVIEW_PROMPT, version=2)
+register_prompt("qa", QA_PROMPT, version=2)
+register_prompt("llm_review", LLM_REVIEW_PROMPT, kind="chat", version=2)
@@ -0,0 +1,326 @@
+# reference_backends.py (AIFlowCraft - Reference data sources: SQLite, CSV, Parquet, DuckDB)
+
+import os
+import pathlib
+import sqlite3
+
+import pandas as pd
+
+from utils import db_profile, db_sampling
+from utils.db_profile import PANDAS_SAMPLE_ROWS, profile_frame, profile_sql
+from utils.db_sampling import quote_identifier
+
+
+# Read-only SQLite connections map up to this many bytes of the file instead of copying pages
+DEFAULT_MMAP_SIZE = int(os.getenv("AIFLOWCRAFT_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+
+def open_readonly(path: str, mmap_size: int = DEFAULT_MMAP_SIZE) -> sqlite3.Connection:
+    """Open a SQLite file in read-only URI mode with memory-mapped I/O."""
+    uri = pathlib.Path(os.path.abspath(path)).as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    return conn
+
+
+def _spread(total: int, count: int) -> list:
+    """``count`` row positions spread evenly over ``total`` rows."""
+    if count <= 0:
+        return []
+    if total <= count:
+        return list(range(total))
+    step = total / count
+    return [int(step * i + step / 2) for i in range(count)]
+
+
+class ReferenceBackend:
+    """Read-only access to one reference data source.
+
+    Sampling (``utils/db_sampling.py``) and profiling
+    (``utils/db_profile.py``) only go through these methods, so every
+    backend gets both, and the caching in ``utils/db_reference.py``.
+    """
+
+    def tables(self) -> list:
+        raise NotImplementedError
+
+    def schema(self, table: str) -> dict:
+        """``{"columns": [{"name", "type", "pk"}], "foreign_keys": [{"column", "table", "to"}]}``."""
+        raise NotImplementedError
+
+    def row_count(self, table: str) -> tuple:
+        """``(rows, exact)``."""
+        raise NotImplementedError
+
+    def sample_rows(self, table: str, rows: int, total: int) -> tuple:
+        """``(column names, rows)`` of up to ``rows`` representative rows, the same on every call."""
+        raise NotImplementedError
+
+    def profile(self, table: str) -> dict:
+        raise NotImplementedError
+
+    def page(self, table: str, after=None, limit: int = 20) -> tuple:
+        """``(column names, rows, next key)`` of the page that starts after key ``after``."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend(ReferenceBackend):
+    def __init__(self, conn):
+        self.conn = conn
+
+    @classmethod
+    def open(cls, path):
+        return cls(open_readonly(path))
+
+    def tables(self):
+        return db_sampling.list_tables(self.conn)
+
+    def schema(self, table):
+        return db_sampling.table_schema(self.conn, table)
+
+    def row_count(self, table):
+        return db_sampling.row_count(self.conn, table)
+
+    def sample_rows(self, table, rows, total):
+        return db_sampling.sample_rows(self.conn, table, rows, total)
+
+    def profile(self, table):
+        return db_profile.profile_table(self.conn, table)
+
+    def page(self, table, after=None, limit=20):
+        return db_sampling.page_rows(self.conn, table, after, limit)
+
+    def close(self):
+        self.conn.close()
+
+
+class _SingleTableBackend(ReferenceBackend):
+    """A file holding one table, named after the file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.table = os.path.splitext(os.path.basename(path))[0]
+        self._schema = None
+
+    def tables(self):
+        return [self.table]
+
+    def _read(self, positions) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def _read_range(self, start, limit) -> pd.DataFrame:
+        return self._read(range(start, start + limit))
+
+    @staticmethod
+    def _records(df) -> tuple:
+        # Missing values read as NaN; show them as None like the SQL backends do
+        df = df.astype(object).where(df.notna(), None)
+        return list(df.columns), list(df.itertuples(index=False, name=None))
+
+    def sample_rows(self, table, rows, total):
+        return self._records(self._read(_spread(total, rows)))
+
+    def page(self, table, after=None, limit=20):
+        # Keys are row positions: files have no index to seek on
+        start = after or 0
+        columns, rows = self._records(self._read_range(start, limit))
+        return columns, rows, (start + limit if len(rows) == limit else None)
+
+    def profile(self, table):
+        total, exact = self.row_count(table)
+        df = self._read(_spread(total, PANDAS_SAMPLE_ROWS))
+        return profile_frame(df, table, self.schema(table), total, exact, sampled=len(df) < total)
+
+
+class CSVBackend(_SingleTableBackend):
+    """A CSV file; rows are counted and sampled in one streaming pass each, never loaded whole."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._rows = None
+
+    @classmethod
+    def open(cls, path):
+        return cls(path)
+
+    def schema(self, table):
+        if self._schema is None:
+            head = pd.read_csv(self.path, nrows=1000)
+            self._schema = {
+                "columns": [{"name": name, "type": str(dtype), "pk": False} for name, dtype in head.dtypes.items()],
+                "foreign_keys": [],
+            }
+        return self._schema
+
+    def row_count(self, table):
+        if self._rows is None:
+            lines = 0
+            last = b"\n"
+            with open(self.path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    lines += chunk.count(b"\n")
+                    last = chunk[-1:]
+            if last != b"\n":
+                lines += 1
+            self._rows = max(lines - 1, 0)
+        # Quoted values may contain newlines, so this is an upper bound
+        return self._rows, False
+
+    def _read(self, positions):
+        wanted = {p + 1 for p in positions}
+        return pd.read_csv(self.path, skiprows=lambda i: i != 0 and i not in wanted)
+
+    def _read_range(self, start, limit):
+        return pd.read_csv(self.path, skiprows=range(1, start + 1), nrows=limit)
+
+
+class ParquetBackend(_SingleTableBackend):
+    """A Parquet file, memory-mapped through pyarrow; only the row groups holding sampled rows are read."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet reference data needs pyarrow: pip install pyarrow") from e
+        self.file = pq.ParquetFile(path, memory_map=True)
+
+    @classmethod
+    def open(cls, path):
+        return cls(path)
+
+    def schema(self, table):
+        if self._schema is None:
+            arrow_schema = self.file.schema_arrow
+            self._schema = {
+                "columns": [{"name": f.name, "type": str(f.type), "pk": False} for f in arrow_schema],
+                "foreign_keys": [],
+            }
+        return self._schema
+
+    def row_count(self, table):
+        return self.file.metadata.num_rows, True
+
+    def _read(self, positions):
+        metadata = self.file.metadata
+        frames = []
+        start = 0
+        positions = sorted(positions)
+        i = 0
+        for group in range(metadata.num_row_groups):
+            size = metadata.row_group(group).num_rows
+            picks = []
+            while i < len(positions) and positions[i] < start + size:
+                picks.append(positions[i] - start)
+                i += 1
+            if picks:
+                frames.append(self.file.read_row_group(group).take(picks).to_pandas())
+            start += size
+        if not frames:
+            return self.file.schema_arrow.empty_table().to_pandas()
+        return pd.concat(frames, ignore_index=True)
+
+
+class DuckDBBackend(ReferenceBackend):
+    """An embedded DuckDB database file, opened read-only."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @classmethod
+    def open(cls, path):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("DuckDB reference data needs duckdb: pip install duckdb") from e
+        return cls(duckdb.connect(path, read_only=True))
+
+    def tables(self):
+        rows = self.conn.execute(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_schema = 'main' AND table_type = 'BASE TABLE' ORDER BY table_name"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _constraints(self, table, kind):
+        try:
+            return self.conn.execute(
+                "SELECT constraint_column_names, referenced_table, referenced_column_names "
+                "FROM duckdb_constraints() WHERE table_name = ? AND constraint_type = ?",
+                [table, kind],
+            ).fetchall()
+        except Exception:
+            # Older DuckDB versions do not expose referenced tables
+            return []
+
+    def schema(self, table):
+        keys = {name for names, _, _ in self._constraints(table, "PRIMARY KEY") for name in names}
+        columns = [
+            {"name": name, "type": data_type, "pk": name in keys}
+            for name, data_type in self.conn.execute(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_schema = 'main' AND table_name = ? ORDER BY ordinal_position",
+                [table],
+            ).fetchall()
+        ]
+        foreign_keys = [
+            {"column": column, "table": target, "to": to}
+            for names, target, targets in self._constraints(table, "FOREIGN KEY")
+            for column, to in zip(names, targets or [])
+        ]
+        return {"columns": columns, "foreign_keys": foreign_keys}
+
+    def row_count(self, table):
+        # DuckDB answers count(*) from its storage metadata
+        return self.conn.execute(f"SELECT count(*) FROM {quote_identifier(table)}").fetchone()[0], True
+
+    def _sample_sql(self, table, rows):
+        return f"SELECT * FROM {quote_identifier(table)} USING SAMPLE reservoir({int(rows)} ROWS) REPEATABLE (42)"
+
+    def sample_rows(self, table, rows, total):
+        cursor = self.conn.execute(self._sample_sql(table, rows))
+        columns = [d[0] for d in cursor.description]
+        return columns, cursor.fetchall()
+
+    def page(self, table, after=None, limit=20):
+        # DuckDB tables have a rowid too, so the SQLite keyset query works unchanged
+        return db_sampling.page_rows(self.conn, table, after, limit)
+
+    def profile(self, table):
+        total, exact = self.row_count(table)
+        # Columnar scans are cheap, so the aggregates cover the whole table
+        sample_df = self.conn.execute(self._sample_sql(table, PANDAS_SAMPLE_ROWS)).df()
+        return profile_sql(
+            self.conn, table, self.schema(table), total, exact,
+            f"SELECT * FROM {quote_identifier(table)}", [], False, sample_df,
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+# config["db_type"] -> backend class
+REFERENCE_BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "csv": CSVBackend,
+    "parquet": ParquetBackend,
+    "duckdb": DuckDBBackend,
+}
+
+# Uploaded file extension -> config["db_type"]
+FILE_TYPES = {
+    ".db": "sqlite",
+    ".sqlite": "sqlite",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".duckdb": "duckdb",
+}
+
+
+def open_backend(db_type: str, path: str) -> ReferenceBackend:
+    if db_type not in REFERENCE_BACKENDS:
+        raise ValueError(f"Unknown reference data type: {db_type}")
+    return REFERENCE_BACKENDS[db_type].open(path)
@@ -0,0 +1,155 @@
+# retrieval.py (AIFlowCraft - BM25 chunk retrieval over uploaded documents)
+
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from utils.token_budget import CHARS_PER_TOKEN, count_tokens
+
+
+DEFAULT_CHUNK_CHARS = 1200
+DEFAULT_CHUNK_OVERLAP = 200
+DEFAULT_TOP_K = 8
+DEFAULT_TOKEN_BUDGET = 3000
+MAX_CACHED_INDEXES = 32
+
+# Extra query terms that steer each stage towards the parts of a document it needs
+STAGE_QUERIES = {
+    "userstories": "user users role actor goal feature requirement story benefit workflow need",
+    "design": "architecture component module service interface api data model schema flow integration",
+    "code": "function implementation algorithm input output validation rule format calculation example",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def chunk_text(text: str, chunk_chars: int = DEFAULT_CHUNK_CHARS, overlap: int = DEFAULT_CHUNK_OVERLAP) -> list:
+    """Split ``text`` into chunks of about ``chunk_chars`` characters.
+
+    Paragraphs are kept together where possible; paragraphs longer than a
+    chunk are cut into windows that overlap by ``overlap`` characters.
+    """
+    chunks = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            step = max(chunk_chars - overlap, 1)
+            for start in range(0, len(paragraph), step):
+                chunks.append(paragraph[start:start + chunk_chars])
+                if start + chunk_chars >= len(paragraph):
+                    break
+        elif len(current) + len(paragraph) + 2 > chunk_chars:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of text chunks."""
+
+    def __init__(self, chunks: list, k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self._term_freqs = [Counter(tokenize(chunk)) for chunk in chunks]
+        self._lengths = [sum(freqs.values()) for freqs in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        doc_freqs = Counter()
+        for freqs in self._term_freqs:
+            doc_freqs.update(freqs.keys())
+        n = len(chunks)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()}
+
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> list:
+        """Return ``(score, chunk_index)`` pairs for the best matching chunks."""
+        terms = [term for term in set(tokenize(query)) if term in self._idf]
+        scores = []
+        for i, freqs in enumerate(self._term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / (self._avg_length or 1))
+            score = 0.0
+            for term in terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores.append((score, i))
+        scores.sort(reverse=True)
+        return scores[:top_k]
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(text: str, chunk_chars: int = DEFAULT_CHUNK_CHARS, overlap: int = DEFAULT_CHUNK_OVERLAP) -> BM25Index:
+    """Build (once) and return the BM25 index of a document."""
+    key = (hashlib.sha256(text.encode("utf-8")).hexdigest(), chunk_chars, overlap)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    index = BM25Index(chunk_text(text, chunk_chars, overlap))
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def retrieve_context(text: str, query: str, stage: str = None, top_k: int = DEFAULT_TOP_K,
+                     token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """Return the parts of ``text`` most relevant to ``query`` and ``stage``.
+
+    Documents that already fit in ``token_budget`` are returned unchanged.
+    Otherwise the best ``top_k`` chunks that fit the budget are returned in
+    document order.
+    """
+    if not text or count_tokens(text) <= token_budget:
+        return text
+
+    index = get_index(text)
+    full_query = f"{query} {STAGE_QUERIES.get(stage, '')}"
+    selected = []
+    used = 0
+    for _, i in index.search(full_query, top_k):
+        cost = count_tokens(index.chunks[i])
+        if used + cost > token_budget:
+            continue
+        selected.append(i)
+        used += cost
+
+    if not selected:
+        return text[:token_budget * CHARS_PER_TOKEN]
+    return "\n...\n".join(index.chunks[i] for i in sorted(selected))
+
+
+def document_context(text: str, query: str, stage: str, settings: dict) -> str:
+    """Apply the retrieval settings from the workflow config to a document's text."""
+    retrieval = settings.get("retrieval", {})
+    if not retrieval.get("enabled", True):
+        return text
+    return retrieve_context(
+        text,
+        query,
+        stage,
+        top_k=retrieval.get("top_k", DEFAULT_TOP_K),
+        token_budget=retrieval.get("token_budget", DEFAULT_TOKEN_BUDGET),
+    )
@@ -1,49 +1,62 @@
-from langchain.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+import re
 from langchain_core.runnables import RunnableLambda
-from langchain_groq import ChatGroq
+from utils.llm_runner import run_prompt, arun_prompt
 
 
-def run_llm_review(stage_output, stage_name, user_input, feedback, api_key):
-    if not api_key:
-        return "REJECTED", "❌ Missing API key for LLM review."
+REVIEW_MODEL = "llama-3.1-8b-instant"
 
-    llm = ChatGroq(temperature=0, groq_api_key=api_key, model_name="llama-3.1-8b-instant")
+# Minimum trailer confidence for a fused review to be trusted on its own
+DEFAULT_FUSED_REVIEW_THRESHOLD = 0.75
 
-    prompt = ChatPromptTemplate.from_template(
-        """
-        You are an expert reviewer for an AI workflow system.
+# How close to the end of the output the Decision line must be to count as a trailer
+TRAILER_WINDOW_LINES = 6
 
-        Your job is to review the output generated for the stage: {stage_name}.
+_DECISION_RE = re.compile(r"^[\s*_#>-]*decision[\s*_]*:\s*(.*)$", re.IGNORECASE)
+_REASON_RE = re.compile(r"^[\s*_#>-]*reason[\s*_]*:\s*(.*)$", re.IGNORECASE)
+_PLACEHOLDER_REASONS = {"", "[your reasoning here]", "<short reason>"}
+# The decision must be the first word of the value: "NOT APPROVED" or "DISAPPROVED" is not an approval
+_DECISION_VALUE_RE = re.compile(r"^[\s*_`\[\"']*(APPROVED|REJECTED)\b(.*)$")
 
-        ---
-        🧾 User Input:
-        {user_input}
 
-        💡 Feedback (if any):
-        {feedback}
+def parse_review_trailer(text):
+    """Parse the ``Decision: / Reason:`` trailer every agent prompt asks for.
 
-        📤 Stage Output to Review:
-        {stage_output}
-        ---
+    Returns ``(decision, reason, confidence)``. ``decision`` is ``None`` when no
+    unambiguous decision was found (e.g. the model echoed "APPROVED or
+    REJECTED"); ``confidence`` drops when the reason is missing or the
+    decision line is not at the end of the output.
+    """
+    lines = [line.strip() for line in (text or "").splitlines() if line.strip()]
+    decision_idx = next((i for i in range(len(lines) - 1, -1, -1) if _DECISION_RE.match(lines[i])), None)
+    if decision_idx is None:
+        return None, "", 0.0
 
-        Evaluate the output based on the user input and feedback.
-        Decide whether it should be APPROVED or REJECTED.
+    value = _DECISION_RE.match(lines[decision_idx]).group(1).upper()
+    match = _DECISION_VALUE_RE.match(value)
+    if match is None:
+        return None, "", 0.0
+    decision, rest = match.groups()
+    # e.g. the model echoed "APPROVED or REJECTED"
+    if ("REJECTED" if decision == "APPROVED" else "APPROVED") in rest:
+        return None, "", 0.0
 
-        Respond in the following format (plain text, no markdown or bullet points):
-        Decision: APPROVED or REJECTED
-        Reason: <short reason>
-        """
-    )
+    reason = ""
+    for line in lines[decision_idx + 1:]:
+        match = _REASON_RE.match(line)
+        if match:
+            reason = match.group(1).strip().strip("*_").strip()
+            break
 
-    chain = prompt | llm | StrOutputParser()
-    raw_response = chain.invoke({
-        "stage_output": stage_output,
-        "stage_name": stage_name,
-        "user_input": user_input,
-        "feedback": feedback or "None"
-    })
+    confidence = 1.0
+    if reason.lower() in _PLACEHOLDER_REASONS:
+        reason = ""
+        confidence -= 0.5
+    if len(lines) - decision_idx > TRAILER_WINDOW_LINES:
+        confidence -= 0.25
+    return decision, reason or "No reason provided.", confidence
 
+
+def _parse_review(raw_response):
     # Extract decision and reason from plain text output
     decision_line = next((line for line in raw_response.splitlines() if "Decision:" in line), "Decision: REJECTED")
     reason_line = next((line for line in raw_response.splitlines() if "Reason:" in line), "Reason: No reason provided.")
@@ -52,3 +65,34 @@ def run_llm_review(stage_output, stage_name, user_input, feedback, api_key):
     reason = reason_line.split(":", 1)[-1].strip()
 
     return decision, reason
+
+
+def _review_inputs(stage_output, stage_name, user_input, feedback):
+    return {
+        "stage_output": stage_output,
+        "stage_name": stage_name,
+        "user_input": user_input,
+        "feedback": feedback or "None"
+    }
+
+
+def run_llm_review(stage_output, stage_name, user_input, feedback, api_key, settings=None):
+    if not api_key:
+        return "REJECTED", "❌ Missing API key for LLM review."
+
+    raw_response = run_prompt(
+        "llm_review", _review_inputs(stage_output, stage_name, user_input, feedback),
+        api_key, REVIEW_MODEL, temperature=0, settings=settings, stage=stage_name
+    )
+    return _parse_review(raw_response)
+
+
+async def arun_llm_review(stage_output, stage_name, user_input, feedback, api_key, settings=None):
+    if not api_key:
+        return "REJECTED", "❌ Missing API key for LLM review."
+
+    raw_response = await arun_prompt(
+        "llm_review", _review_inputs(stage_output, stage_name, user_input, feedback),
+        api_key, REVIEW_MODEL, temperature=0, settings=settings, stage=stage_name
+    )
+    return _parse_review(raw_response)
@@ -0,0 +1,126 @@
+# token_budget.py (AIFlowCraft - Prompt token counting and budgeting)
+
+import math
+import string
+
+
+# Context window (tokens) of the models the agents use
+MODEL_CONTEXT = {
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+    "qwen-2.5-coder-32b": 131072,
+    "mixtral-8x7b-32768": 32768,
+    "gemma2-9b-it": 8192,
+}
+DEFAULT_CONTEXT = 8192
+
+# Tokens kept free for the model's answer
+DEFAULT_COMPLETION_RESERVE = 2048
+
+CHARS_PER_TOKEN = 4
+
+# Input slot -> priority; lower-priority slots are trimmed first
+SLOT_PRIORITIES = {
+    "stage_name": 100,
+    "user_input": 100,
+    "feedback": 90,
+    "feedback_text": 90,
+    "stage_output": 80,
+    "code": 70,
+    "code_snippet": 70,
+    "design_doc": 60,
+    "user_stories": 50,
+    "file_content": 30,
+    "reference_text": 20,
+}
+DEFAULT_SLOT_PRIORITY = 50
+
+# A trimmed slot always keeps at least this many tokens
+MIN_SLOT_TOKENS = 64
+
+
+def _estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+_token_counter = _estimate_tokens
+
+
+def set_token_counter(counter):
+    """Replace the default ~4 characters/token estimate, e.g. with a real tokenizer."""
+    global _token_counter
+    _token_counter = counter
+
+
+def count_tokens(text) -> int:
+    return _token_counter(text or "")
+
+
+def prompt_budget(model: str, settings: dict = None) -> int:
+    """Maximum prompt tokens for ``model``, optionally capped by ``max_prompt_tokens`` in ``settings``."""
+    settings = settings or {}
+    reserve = settings.get("completion_reserve_tokens", DEFAULT_COMPLETION_RESERVE)
+    budget = MODEL_CONTEXT.get(model, DEFAULT_CONTEXT) - reserve
+    if settings.get("max_prompt_tokens"):
+        budget = min(budget, settings["max_prompt_tokens"])
+    return budget
+
+
+def slot_occurrences(template_text: str) -> dict:
+    """How many times each variable appears in a template."""
+    counts = {}
+    for _, field, _, _ in string.Formatter().parse(template_text):
+        if field:
+            counts[field] = counts.get(field, 0) + 1
+    return counts
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of ``text`` so that it fits in about ``max_tokens``."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    marker = "\n[... {} characters trimmed to fit the token budget ...]\n"
+    keep_chars = max(max_tokens * CHARS_PER_TOKEN - len(marker) - 10, 0)
+    head = keep_chars * 2 // 3
+    tail = keep_chars - head
+    omitted = len(text) - head - tail
+    return text[:head] + marker.format(omitted) + (text[len(text) - tail:] if tail else "")
+
+
+def fit_inputs(template_text: str, inputs: dict, budget: int, compact_min_chars: int = None):
+    """Trim prompt inputs so the rendered prompt fits in ``budget`` tokens.
+
+    Slots are trimmed in order of ascending priority (see ``SLOT_PRIORITIES``),
+    each down to ``MIN_SLOT_TOKENS`` at most, until the prompt fits. Returns
+    ``(inputs, report)`` where ``report`` has the estimated ``prompt_tokens``,
+    the ``budget`` and ``trimmed``: slot -> (tokens before, tokens after).
+    Pass ``compact_min_chars`` when the prompt is rendered with
+    ``utils/prompt_compaction.py``: values at least that long are then only
+    counted once however often the template uses them.
+    """
+    occurrences = slot_occurrences(template_text)
+    if compact_min_chars is not None:
+        for name in occurrences:
+            if len(str(inputs.get(name, ""))) >= compact_min_chars:
+                occurrences[name] = 1
+    static_tokens = count_tokens(template_text.format(**{name: "" for name in occurrences}))
+    slot_tokens = {name: count_tokens(str(inputs.get(name, ""))) for name in occurrences}
+    total = static_tokens + sum(slot_tokens[name] * occurrences[name] for name in occurrences)
+
+    fitted = dict(inputs)
+    trimmed = {}
+    for name in sorted(occurrences, key=lambda n: SLOT_PRIORITIES.get(n, DEFAULT_SLOT_PRIORITY)):
+        if total <= budget:
+            break
+        excess = total - budget
+        current = slot_tokens[name]
+        target = max(current - math.ceil(excess / occurrences[name]), MIN_SLOT_TOKENS)
+        if target >= current:
+            continue
+        fitted[name] = truncate_to_tokens(str(inputs.get(name, "")), target)
+        new_tokens = count_tokens(fitted[name])
+        total -= (current - new_tokens) * occurrences[name]
+        slot_tokens[name] = new_tokens
+        trimmed[name] = (current, new_tokens)
+
+    return fitted, {"prompt_tokens": total, "budget": budget, "trimmed": trimmed}
@@ -0,0 +1,242 @@
+# tracing.py (AIFlowCraft - Nested timing spans with pluggable exporters)
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+SERVICE_NAME = "aiflowcraft"
+DEFAULT_MEMORY_SPANS = 5000
+
+_current_span = ContextVar("trace_span", default=None)
+_sinks = []
+_sinks_lock = threading.Lock()
+# Counters roll up into parents that may be running on another thread
+_counters_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation. ``attributes`` describe it; ``counters`` add up into every enclosing span."""
+
+    def __init__(self, name, trace_id, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.counters = {}
+        self.start = time.time()
+        self.end = None
+        self.duration_ms = None
+        self.status = "ok"
+        self.error = None
+        self._started = time.perf_counter()
+
+    @property
+    def parent_id(self):
+        return self.parent.span_id if self.parent is not None else None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, name, value=1):
+        with _counters_lock:
+            span = self
+            while span is not None:
+                span.counters[name] = span.counters.get(name, 0) + value
+                span = span.parent
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def mark_first_token(self):
+        """Record time-to-first-token; only the first call counts."""
+        self.attributes.setdefault("ttft_ms", round(self.elapsed_ms(), 1))
+
+    def finish(self):
+        self.duration_ms = round(self.elapsed_ms(), 1)
+        self.end = self.start + self.duration_ms / 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start": self.start, "end": self.end, "duration_ms": self.duration_ms,
+            "status": self.status, "error": self.error,
+            "attributes": dict(self.attributes), "counters": dict(self.counters),
+        }
+
+
+def _trace_id(value) -> str:
+    """``value`` as an OpenTelemetry trace id (32 hex digits), hashing anything else."""
+    value = str(value)
+    if re.fullmatch(r"[0-9a-f]{32}", value):
+        return value
+    return hashlib.md5(value.encode("utf-8")).hexdigest()
+
+
+def add_to_span(name, value=1):
+    """Add to a counter of the current span (and its parents), if there is one."""
+    span = _current_span.get()
+    if span is not None:
+        span.add(name, value)
+
+
+@contextmanager
+def span(name, trace_id=None, **attributes):
+    """Time the block as a child of the current span.
+
+    A span without a parent starts a trace: ``trace_id`` (e.g. a workflow
+    run id) groups the spans of one run, otherwise a new id is drawn.
+    The finished span is passed to every registered sink.
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        trace = parent.trace_id
+    else:
+        trace = _trace_id(trace_id) if trace_id else uuid.uuid4().hex
+    current = Span(name, trace, parent, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+        _export(current)
+
+
+# === Sinks ===
+
+def add_sink(sink):
+    with _sinks_lock:
+        if sink not in _sinks:
+            _sinks.append(sink)
+
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def _export(finished: Span):
+    with _sinks_lock:
+        sinks = list(_sinks)
+    for sink in sinks:
+        try:
+            sink.export(finished)
+        except Exception:
+            # Tracing must never break the workflow
+            pass
+
+
+class InMemorySink:
+    """The most recent finished spans, as dicts, for display in the app."""
+
+    def __init__(self, max_spans: int = DEFAULT_MEMORY_SPANS):
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, finished: Span):
+        record = finished.to_dict()
+        with self._lock:
+            self._spans.append(record)
+
+    def spans(self, trace_id: str = None) -> list:
+        """Finished spans (of one trace), in start order."""
+        with self._lock:
+            spans = [s for s in self._spans if trace_id is None or s["trace_id"] == trace_id]
+        return sorted(spans, key=lambda s: s["start"])
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+class JsonlSink:
+    """One JSON object per finished span, appended to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, line: str):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def export(self, finished: Span):
+        self._write(json.dumps(finished.to_dict(), ensure_ascii=False, default=str))
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list, service_name: str = SERVICE_NAME) -> dict:
+    """An OTLP/JSON ``ExportTraceServiceRequest`` holding ``spans`` (span dicts)."""
+    otlp_spans = []
+    for s in spans:
+        values = dict(s["attributes"], **s["counters"])
+        otlp_span = {
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            "name": s["name"],
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(int(s["start"] * 1e9)),
+            "endTimeUnixNano": str(int(s["end"] * 1e9)),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in values.items() if value is not None],
+            "status": {"code": 2, "message": s["error"]} if s["status"] == "error" else {"code": 1},
+        }
+        if s["parent_id"]:
+            otlp_span["parentSpanId"] = s["parent_id"]
+        otlp_spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "aiflowcraft.tracing"}, "spans": otlp_spans}],
+        }]
+    }
+
+
+class OTLPJsonSink(JsonlSink):
+    """OpenTelemetry-compatible export without a network or SDK.
+
+    Writes one OTLP/JSON ``ExportTraceServiceRequest`` per line, the format
+    the OpenTelemetry Collector's ``otlpjsonfile`` receiver reads, so traces
+    recorded offline can be replayed into any OTLP backend later.
+    """
+
+    def __init__(self, path: str, service_name: str = SERVICE_NAME):
+        super().__init__(path)
+        self.service_name = service_name
+
+    def export(self, finished: Span):
+        self._write(json.dumps(to_otlp([finished.to_dict()], self.service_name), ensure_ascii=False))
+
+
+def sinks_from_env() -> list:
+    """File sinks named by ``AIFLOWCRAFT_TRACE_FILE`` (JSONL) and ``AIFLOWCRAFT_OTLP_FILE`` (OTLP/JSON)."""
+    sinks = []
+    if os.getenv("AIFLOWCRAFT_TRACE_FILE"):
+        sinks.append(JsonlSink(os.environ["AIFLOWCRAFT_TRACE_FILE"]))
+    if os.getenv("AIFLOWCRAFT_OTLP_FILE"):
+        sinks.append(OTLPJsonSink(os.environ["AIFLOWCRAFT_OTLP_FILE"]))
+    return sinks
@@ -0,0 +1,147 @@
+# upload_store.py (AIFlowCraft - Content-addressed store for uploaded files)
+
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+
+DEFAULT_UPLOAD_DIR = os.getenv(
+    "AIFLOWCRAFT_UPLOAD_DIR",
+    os.path.join(tempfile.gettempdir(), "aiflowcraft_uploads"),
+)
+CHUNK_SIZE = 1 << 20
+# Unreferenced files younger than this are kept by prune(); another process may be using them
+PRUNE_GRACE_SECONDS = 3600
+
+
+class UploadStore:
+    """Uploaded files stored once, under the SHA-256 of their content.
+
+    ``put`` streams a file to disk in chunks while hashing it, so identical
+    uploads from any session end up as one file that is never rewritten.
+    Sessions hold a ``lease`` on (or ``acquire``) the files they use and
+    release them when they switch to another file; a file (and side files
+    such as its search index) is deleted when its last reference is
+    released, after ``on_delete(path)`` has let go of open handles to it.
+    """
+
+    def __init__(self, root: str = DEFAULT_UPLOAD_DIR, on_delete=None):
+        self.root = root
+        self.on_delete = on_delete
+        os.makedirs(root, exist_ok=True)
+        self._refs = {}
+        self._lock = threading.Lock()
+
+    def path(self, digest: str, suffix: str = "") -> str:
+        return os.path.join(self.root, digest + suffix)
+
+    def put(self, uploaded_file, suffix: str = "", acquire: bool = False) -> str:
+        """Store ``uploaded_file`` (any object with ``read``) and return its digest.
+
+        With ``acquire`` a reference is taken in the same step, so a
+        concurrent release of the last reference cannot delete the file
+        before the caller holds it.
+        """
+        if hasattr(uploaded_file, "seek"):
+            uploaded_file.seek(0)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in iter(lambda: uploaded_file.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    out.write(chunk)
+            key = digest.hexdigest()
+            target = self.path(key, suffix)
+            with self._lock:
+                if acquire:
+                    self._refs[(key, suffix)] = self._refs.get((key, suffix), 0) + 1
+                if os.path.exists(target):
+                    os.remove(tmp_path)
+                else:
+                    # Readers only ever see complete files
+                    os.replace(tmp_path, target)
+            return key
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def lease(self, uploaded_file, suffix: str = "") -> "UploadLease":
+        """Store ``uploaded_file`` and hold a reference to it until the lease is released."""
+        return UploadLease(self, self.put(uploaded_file, suffix, acquire=True), suffix)
+
+    def acquire(self, digest: str, suffix: str = "") -> str:
+        """Take a reference to a stored file and return its path."""
+        with self._lock:
+            self._refs[(digest, suffix)] = self._refs.get((digest, suffix), 0) + 1
+        return self.path(digest, suffix)
+
+    def release(self, digest: str, suffix: str = ""):
+        with self._lock:
+            count = self._refs.get((digest, suffix), 0) - 1
+            if count > 0:
+                self._refs[(digest, suffix)] = count
+                return
+            self._refs.pop((digest, suffix), None)
+            self._delete(self.path(digest, suffix))
+
+    def refcount(self, digest: str, suffix: str = "") -> int:
+        with self._lock:
+            return self._refs.get((digest, suffix), 0)
+
+    def _delete(self, path):
+        if self.on_delete is not None:
+            try:
+                self.on_delete(path)
+            except Exception:
+                pass
+        for name in [path] + glob.glob(glob.escape(path) + ".*"):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+    def prune(self, grace_seconds: int = PRUNE_GRACE_SECONDS) -> int:
+        """Delete unreferenced files older than ``grace_seconds``; returns how many were removed."""
+        with self._lock:
+            referenced = {self.path(digest, suffix) for digest, suffix in self._refs}
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            owner = next((ref for ref in referenced if path == ref or path.startswith(ref + ".")), None)
+            if owner is None and now - os.path.getmtime(path) > grace_seconds:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+
+class UploadLease:
+    """One session's reference to a stored file.
+
+    Released by ``release`` or, if the session simply goes away (e.g. an
+    expired Streamlit session), when the lease is garbage collected.
+    """
+
+    def __init__(self, store: UploadStore, digest: str, suffix: str = ""):
+        self.digest = digest
+        self.suffix = suffix
+        self.path = store.path(digest, suffix)
+        self._finalizer = weakref.finalize(self, store.release, digest, suffix)
+
+    @property
+    def released(self) -> bool:
+        return not self._finalizer.alive
+
+    def release(self):
+        # A finalizer runs at most once, so releasing twice is harmless
+        self._finalizer()
+
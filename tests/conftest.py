@@ -0,0 +1,97 @@
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+# The app runs from src/ and imports its packages as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from orchestrator import engine  # noqa: E402
+
+
+class StubLLM:
+    """Stands in for the stage agents and the AI reviewer.
+
+    Stage ``n``-th outputs are ``"<stage> v<n>"``; ``delays`` slows stages
+    down and ``verdicts`` scripts the reviewer per stage (APPROVED once a
+    stage's list is used up). Every call is recorded.
+    """
+
+    def __init__(self):
+        self.delays = {}
+        self.verdicts = {}
+        self.events = []
+        self.settings = {}
+        self.reviewed = []
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def _start(self, stage, args):
+        with self._lock:
+            self._counts[stage] += 1
+            self.events.append((stage, "start", time.monotonic()))
+            self.settings.setdefault(stage, []).append(next(a for a in args if isinstance(a, dict)))
+            return f"{stage} v{self._counts[stage]}"
+
+    def _end(self, stage):
+        with self._lock:
+            self.events.append((stage, "end", time.monotonic()))
+
+    def generations(self, stage) -> int:
+        return self._counts[stage]
+
+    def started(self) -> list:
+        return [stage for stage, event, _ in self.events if event == "start"]
+
+    def time_of(self, stage, event, nth=0) -> float:
+        return [t for s, e, t in self.events if s == stage and e == event][nth]
+
+    def agent(self, stage, original):
+        @functools.wraps(original)
+        def generate(*args):
+            out = self._start(stage, args)
+            time.sleep(self.delays.get(stage, 0))
+            self._end(stage)
+            return out
+        return generate
+
+    def aagent(self, stage, original):
+        @functools.wraps(original)
+        async def agenerate(*args):
+            out = self._start(stage, args)
+            await asyncio.sleep(self.delays.get(stage, 0))
+            self._end(stage)
+            return out
+        return agenerate
+
+    def review(self, stage_output, stage_name, **kwargs):
+        with self._lock:
+            self.reviewed.append(stage_output)
+            verdicts = self.verdicts.get(stage_name)
+            decision = verdicts.pop(0) if verdicts else "APPROVED"
+        return decision, f"{decision.lower()} by stub"
+
+    async def areview(self, **kwargs):
+        return self.review(**kwargs)
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    stub = StubLLM()
+    for stage, agent in list(engine.STAGE_AGENTS.items()):
+        monkeypatch.setitem(engine.STAGE_AGENTS, stage, stub.agent(stage, agent))
+    for stage, agent in list(engine.ASYNC_STAGE_AGENTS.items()):
+        monkeypatch.setitem(engine.ASYNC_STAGE_AGENTS, stage, stub.aagent(stage, agent))
+    monkeypatch.setattr(engine, "run_llm_review", stub.review)
+    monkeypatch.setattr(engine, "arun_llm_review", stub.areview)
+    return stub
+
+
+@pytest.fixture
+def config():
+    return {"groq_api_key": "test-key", "db_type": "none", "db_path": ""}
@@ -0,0 +1,56 @@
+import asyncio
+
+from orchestrator.async_runner import arun_workflow
+from orchestrator.engine import STAGES, WorkflowEngine
+
+
+def test_run_until_pause_reaches_end_in_stage_order(stub_llm, config):
+    engine = WorkflowEngine(config=config)
+    engine.start()
+
+    engine.run_until_pause("A todo app", None)
+
+    assert engine.is_finished
+    assert stub_llm.started() == STAGES
+    assert all(engine.approved[stage] for stage in STAGES)
+    assert engine.output["qa"] == "qa v1"
+
+
+def test_rejection_regenerates_the_fallback_stage_with_feedback(stub_llm, config):
+    stub_llm.verdicts["review"] = ["REJECTED"]
+    engine = WorkflowEngine(config=config)
+    engine.start()
+
+    engine.run_until_pause("A todo app", None)
+
+    assert engine.is_finished
+    assert stub_llm.started() == ["userstories", "design", "code", "review", "code", "review", "qa"]
+    assert engine.output["code"] == "code v2"
+    # The rejected response must not be served from the cache again
+    assert stub_llm.settings["code"][1]["cache_bypass"] == {"code": True}
+
+
+def test_user_review_pauses_until_approved(stub_llm, config):
+    review_mode = {stage: "AI" for stage in STAGES}
+    review_mode["design"] = "User"
+    engine = WorkflowEngine(config=config, review_mode=review_mode)
+    engine.start()
+
+    engine.run_until_pause("A todo app", None)
+    assert engine.paused_stage == "design"
+    assert stub_llm.started() == ["userstories", "design"]
+
+    engine.approve("design")
+    engine.run_until_pause("A todo app", None)
+    assert engine.is_finished
+
+
+def test_arun_workflow_stops_a_reviewer_that_never_approves(stub_llm, config):
+    stub_llm.verdicts["userstories"] = ["REJECTED"] * 100
+    engine = WorkflowEngine(config=config)
+
+    asyncio.run(arun_workflow(engine, "A todo app", max_total_steps=10))
+
+    assert not engine.is_finished
+    assert stub_llm.generations("userstories") == 5
+    assert "Stopped after 10 steps" in engine.logs[-1]
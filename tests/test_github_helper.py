@@ -0,0 +1,234 @@
+import hashlib
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils import github_queue
+from utils.github_helper import GitHubUploader, git_blob_sha, upload_file_to_github
+from utils.github_queue import GitHubUploadQueue
+
+
+class FakeRepo:
+    """The parts of one repository the Git Data API exposes, kept in memory."""
+
+    def __init__(self):
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.refs = {}
+        self.requests = []
+        self.authorizations = []
+        # (status, headers) answered to the next requests instead of handling them
+        self.failures = []
+        self.refs["main"] = self.commit(self.tree({"README.md": "hello\n"}), [], "Initial commit")
+
+    def tree(self, files):
+        entries = {}
+        for path, content in files.items():
+            sha = git_blob_sha(content)
+            self.blobs[sha] = content
+            entries[path] = sha
+        sha = hashlib.sha1(json.dumps(sorted(entries.items())).encode()).hexdigest()
+        self.trees[sha] = entries
+        return sha
+
+    def commit(self, tree, parents, message):
+        sha = hashlib.sha1(json.dumps([tree, parents, message, len(self.commits)]).encode()).hexdigest()
+        self.commits[sha] = {"tree": tree, "parents": parents, "message": message}
+        return sha
+
+    def files(self, branch="main"):
+        tree = self.trees[self.commits[self.refs[branch]]["tree"]]
+        return {path: self.blobs[sha] for path, sha in tree.items()}
+
+    def handle(self, method, path, body, authorization=None):
+        self.requests.append((method, path))
+        self.authorizations.append(authorization)
+        if self.failures:
+            status, headers = self.failures.pop(0)
+            return status, {"message": "injected failure"}, headers
+        route = re.match(r"/repos/[^/]+/[^/]+(/.*)?$", path.split("?")[0]).group(1) or ""
+
+        if method == "GET" and route == "":
+            return 200, {"default_branch": "main"}, {}
+        if method == "GET" and route.startswith("/contents/"):
+            sha = self.trees[self.commits[self.refs["main"]]["tree"]].get(route[len("/contents/"):])
+            return (200, {"sha": sha}, {}) if sha else (404, {"message": "Not Found"}, {})
+        if method == "GET" and route.startswith("/git/ref/heads/"):
+            branch = route[len("/git/ref/heads/"):]
+            if branch not in self.refs:
+                return 404, {"message": "Not Found"}, {}
+            return 200, {"object": {"sha": self.refs[branch]}}, {}
+        if method == "GET" and route.startswith("/git/commits/"):
+            sha = route.rsplit("/", 1)[1]
+            return 200, {"sha": sha, "tree": {"sha": self.commits[sha]["tree"]}}, {}
+        if method == "GET" and route.startswith("/git/trees/"):
+            sha = route.rsplit("/", 1)[1]
+            entries = [{"path": p, "type": "blob", "mode": "100644", "sha": s} for p, s in self.trees[sha].items()]
+            return 200, {"sha": sha, "tree": entries, "truncated": False}, {}
+        if method == "POST" and route == "/git/trees":
+            files = {}
+            if body.get("base_tree"):
+                files = {p: self.blobs[s] for p, s in self.trees[body["base_tree"]].items()}
+            files.update({entry["path"]: entry["content"] for entry in body["tree"]})
+            return 201, {"sha": self.tree(files)}, {}
+        if method == "POST" and route == "/git/commits":
+            return 201, {"sha": self.commit(body["tree"], body["parents"], body["message"])}, {}
+        if method == "PATCH" and route.startswith("/git/refs/heads/"):
+            self.refs[route[len("/git/refs/heads/"):]] = body["sha"]
+            return 200, {"object": {"sha": body["sha"]}}, {}
+        if method == "POST" and route == "/git/refs":
+            self.refs[body["ref"][len("refs/heads/"):]] = body["sha"]
+            return 201, {"object": {"sha": body["sha"]}}, {}
+        return 404, {"message": "Not Found"}, {}
+
+
+@pytest.fixture
+def repo():
+    return FakeRepo()
+
+
+@pytest.fixture
+def base_url(repo):
+    class Handler(BaseHTTPRequestHandler):
+        def _respond(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            status, payload, headers = repo.handle(self.command, self.path, body, self.headers.get("Authorization"))
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PATCH = _respond
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def uploader(base_url, branch="main"):
+    return GitHubUploader("token", "owner/project", branch=branch, base_url=base_url, session=requests.Session())
+
+
+def test_commit_files_commits_only_changed_files(repo, base_url):
+    head = repo.refs["main"]
+
+    result = uploader(base_url).commit_files(
+        {"README.md": "hello\n", "src/app.py": "print('hi')\n"}, "Add app", companions={"logs.txt": "run log\n"}
+    )
+
+    assert result["files"] == ["logs.txt", "src/app.py"]
+    assert result["unchanged"] == ["README.md"]
+    assert repo.refs["main"] == result["commit"]
+    assert repo.commits[result["commit"]]["parents"] == [head]
+    assert repo.files() == {"README.md": "hello\n", "src/app.py": "print('hi')\n", "logs.txt": "run log\n"}
+
+
+def test_commit_files_without_changes_makes_no_commit(repo, base_url):
+    head = repo.refs["main"]
+
+    result = uploader(base_url).commit_files({"README.md": "hello\n"}, "No-op", companions={"logs.txt": "run log\n"})
+
+    assert result == {"commit": None, "files": [], "unchanged": ["README.md"]}
+    assert repo.refs["main"] == head
+    assert not any(method != "GET" for method, _ in repo.requests)
+
+
+def test_commit_files_creates_missing_branch_from_default_branch(repo, base_url):
+    main_head = repo.refs["main"]
+
+    result = uploader(base_url, branch="aiflowcraft/run-1").commit_files({"app.py": "x = 1\n"}, "Add app")
+
+    assert repo.refs["aiflowcraft/run-1"] == result["commit"]
+    assert repo.commits[result["commit"]]["parents"] == [main_head]
+    assert repo.files("aiflowcraft/run-1") == {"README.md": "hello\n", "app.py": "x = 1\n"}
+    assert repo.refs["main"] == main_head
+    assert ("POST", "/repos/owner/project/git/refs") in repo.requests
+
+
+def test_upload_file_to_github_skips_and_logs_unchanged_file(repo, base_url, caplog):
+    caplog.set_level("INFO", logger="utils.github_helper")
+
+    status, response = upload_file_to_github("token", "owner/project", "README.md", "hello\n", base_url=base_url)
+
+    assert status == 200 and response["skipped"]
+    assert [method for method, _ in repo.requests] == ["GET"]
+    assert "README.md to owner/project@main skipped: file is unchanged" in caplog.text
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(github_queue, "BASE_DELAY", 0.01)
+    queue = GitHubUploadQueue(path=str(tmp_path / "queue.sqlite"))
+    yield queue
+    queue.stop(timeout=5)
+
+
+def test_queue_retries_rate_limits_and_server_errors(repo, base_url, queue):
+    repo.failures = [(429, {"Retry-After": "0"}), (502, {})]
+    statuses = []
+
+    queue.enqueue("run-1", "token", "owner/project", {"app.py": "x = 1\n"}, "Add app",
+                  base_url=base_url, on_status=lambda job: statuses.append(job["status"]))
+    job = queue.wait("run-1", timeout=10)
+
+    assert job["status"] == "done"
+    assert job["attempts"] == 3
+    assert statuses == ["queued", "queued", "done"]
+    assert repo.refs["main"] == job["result"]["commit"]
+    assert repo.files()["app.py"] == "x = 1\n"
+
+
+def test_queue_fails_on_client_error_until_retried(repo, base_url, queue):
+    repo.failures = [(422, {})]
+
+    queue.enqueue("run-2", "token", "owner/project", {"app.py": "x = 1\n"}, "Add app", base_url=base_url)
+    job = queue.wait("run-2", timeout=10)
+
+    assert job["status"] == "failed"
+    assert job["attempts"] == 1
+    assert job["error"] == "injected failure"
+
+    assert not queue.has_token(job)
+    queue.retry("run-2", "token")
+    job = queue.wait("run-2", timeout=10)
+
+    assert job["status"] == "done"
+    assert repo.files()["app.py"] == "x = 1\n"
+
+
+def test_queue_enqueue_is_idempotent_per_key(repo, base_url, queue):
+    queue.enqueue("run-3", "token", "owner/project", {"app.py": "x = 1\n"}, "Add app", base_url=base_url)
+    first = queue.wait("run-3", timeout=10)
+    queue.enqueue("run-3", "token", "owner/project", {"app.py": "x = 2\n"}, "Add app again", base_url=base_url)
+
+    assert queue.wait("run-3", timeout=10) == first
+    assert repo.files()["app.py"] == "x = 1\n"
+
+
+def test_queue_commits_each_job_with_its_own_token(repo, base_url, queue):
+    queue.stop(timeout=5)
+    queue.enqueue("run-a", "token-a", "owner/project", {"a.py": "a = 1\n"}, "Add a", base_url=base_url)
+    queue.enqueue("run-b", "token-b", "owner/project", {"b.py": "b = 1\n"}, "Add b", base_url=base_url)
+
+    queue.start()
+    assert queue.wait("run-a", timeout=10)["status"] == "done"
+    assert queue.wait("run-b", timeout=10)["status"] == "done"
+
+    assert set(repo.authorizations) == {"Bearer token-a", "Bearer token-b"}
+    writes = [auth for (method, _), auth in zip(repo.requests, repo.authorizations) if method != "GET"]
+    assert writes.count("Bearer token-a") == writes.count("Bearer token-b") == 3
@@ -0,0 +1,43 @@
+import pytest
+
+from utils.review_utils import parse_review_trailer
+
+
+@pytest.mark.parametrize("text, decision", [
+    ("Body\n\nDecision: APPROVED\nReason: Complete.", "APPROVED"),
+    ("Body\n\n**Decision:** REJECTED\n**Reason:** Missing tests.", "REJECTED"),
+    ("Body\n\nDecision: approved.\nReason: Fine.", "APPROVED"),
+    ("Body\n\nDecision: [APPROVED]\nReason: Fine.", "APPROVED"),
+])
+def test_clear_trailers_are_parsed(text, decision):
+    parsed, reason, confidence = parse_review_trailer(text)
+    assert parsed == decision
+    assert confidence == 1.0
+
+
+@pytest.mark.parametrize("value", [
+    "NOT APPROVED",
+    "DISAPPROVED",
+    "UNAPPROVED",
+    "APPROVED or REJECTED",
+    "REJECTED / APPROVED",
+    "Pending",
+])
+def test_negated_or_echoed_decisions_are_unclear(value):
+    assert parse_review_trailer(f"Body\n\nDecision: {value}\nReason: Something.") == (None, "", 0.0)
+
+
+def test_missing_trailer_is_unclear():
+    assert parse_review_trailer("Just a design document.") == (None, "", 0.0)
+
+
+def test_placeholder_reason_lowers_confidence():
+    decision, reason, confidence = parse_review_trailer("Body\nDecision: APPROVED\nReason: [your reasoning here]")
+    assert decision == "APPROVED"
+    assert reason == "No reason provided."
+    assert confidence == 0.5
+
+
+def test_last_decision_line_wins():
+    text = "Decision: REJECTED\nReason: draft\n\nRevised body\nDecision: APPROVED\nReason: Fixed."
+    assert parse_review_trailer(text)[:2] == ("APPROVED", "Fixed.")
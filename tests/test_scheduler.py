@@ -0,0 +1,103 @@
+import asyncio
+
+from orchestrator.async_runner import arun_workflow
+from orchestrator.engine import STAGES
+from orchestrator.scheduler import DagWorkflowEngine, stage_dependencies
+
+
+def test_dependencies_come_from_agent_signatures():
+    assert stage_dependencies() == {
+        "userstories": set(),
+        "design": set(),
+        "code": {"design"},
+        "review": {"code"},
+        "qa": {"userstories", "design", "code"},
+    }
+
+
+def test_independent_stages_run_in_parallel_and_dependents_wait(stub_llm, config):
+    stub_llm.delays = {"userstories": 0.2, "design": 0.2}
+    engine = DagWorkflowEngine(config=config)
+    engine.start()
+
+    engine.run_until_pause("A todo app", None)
+
+    assert engine.is_finished
+    assert sorted(stub_llm.started()[:2]) == ["design", "userstories"]
+    # Both first stages were running at the same time
+    assert stub_llm.time_of("design", "start") < stub_llm.time_of("userstories", "end")
+    assert stub_llm.time_of("userstories", "start") < stub_llm.time_of("design", "end")
+    assert stub_llm.time_of("code", "start") >= stub_llm.time_of("design", "end")
+    assert stub_llm.time_of("review", "start") >= stub_llm.time_of("code", "end")
+    assert stub_llm.time_of("qa", "start") >= max(
+        stub_llm.time_of(stage, "end") for stage in ("userstories", "design", "code")
+    )
+    assert {stub_llm.generations(stage) for stage in STAGES} == {1}
+
+
+def test_rejection_invalidates_dependents_of_the_regenerated_stage(stub_llm, config):
+    review_mode = {stage: "AI" for stage in STAGES}
+    review_mode["review"] = "User"
+    engine = DagWorkflowEngine(config=config, review_mode=review_mode)
+    engine.start()
+
+    engine.run_until_pause("A todo app", None)
+    assert engine.paused_stage == "review"
+    assert engine.approved["qa"] is True
+
+    engine.reject("review", "Handle empty lists")
+    # A rejected review regenerates code, so everything built on code is void
+    assert engine.approved["code"] is False
+    assert "review" not in engine.approved and "qa" not in engine.approved
+    assert engine.approved["userstories"] is True and engine.approved["design"] is True
+
+    engine.run_until_pause("A todo app", None)
+    assert engine.paused_stage == "review"
+    assert stub_llm.generations("code") == stub_llm.generations("qa") == 2
+    assert stub_llm.generations("design") == 1
+    assert engine.feedback["review"] == "Handle empty lists"
+
+
+def test_output_built_on_stale_inputs_is_discarded(stub_llm, config):
+    # qa is still running on code v1 when the review rejects code
+    stub_llm.delays = {"qa": 0.3}
+    stub_llm.verdicts["review"] = ["REJECTED"]
+    engine = DagWorkflowEngine(config=config)
+    engine.start()
+
+    shown = []
+    original_store = engine._store_output
+    engine._store_output = lambda stage, out, keys: (shown.append((stage, out)), original_store(stage, out, keys))
+
+    engine.run_until_pause("A todo app", None)
+
+    assert engine.is_finished
+    assert any("Discarded qa output" in message for message in engine.logs)
+    assert stub_llm.generations("qa") == 2
+    # The first qa run was never published, and its rebuild was not treated as a regeneration
+    assert ("qa", "qa v1") not in shown
+    assert engine.output["qa"] == "qa v2"
+    assert "qa" not in stub_llm.settings["qa"][1].get("cache_bypass", {})
+
+
+def test_restart_rebuilds_every_stage(stub_llm, config):
+    engine = DagWorkflowEngine(config=config)
+    engine.start()
+    engine.run_until_pause("A todo app", None)
+
+    engine.start()
+    engine.run_until_pause("A chess app", None)
+
+    assert engine.is_finished
+    assert {stub_llm.generations(stage) for stage in STAGES} == {2}
+
+
+def test_arun_workflow_drives_the_dag(stub_llm, config):
+    stub_llm.delays = {"userstories": 0.1, "design": 0.1}
+    engine = DagWorkflowEngine(config=config)
+
+    asyncio.run(arun_workflow(engine, "A todo app"))
+
+    assert engine.is_finished
+    assert sorted(engine.output) == sorted(STAGES)
+    assert stub_llm.time_of("design", "start") < stub_llm.time_of("userstories", "end")